@@ -1,4 +1,4 @@
-from django.apps import AppConfig
+from common.app_config import AppConfig
 
 
 class MetricsConfig(AppConfig):
@@ -1,23 +1,159 @@
-from prometheus_client import Counter, Info, Summary
+from prometheus_client import Counter, Gauge, Histogram, Info, Summary
 
 info = Info(name="thumbnails", documentation="Thumbnail service information.")
 info.info({"version": "1.0", "language": "python", "framework": "django"})
 
 
+# Upper bounds of the `size` label: clients pick any dimensions, labelling series with them
+# would make the number of series unbounded.
+SIZE_BUCKETS = (64, 128, 256, 512, 1024, 2048)
+
+
+def get_size_bucket(max_width: int, max_height: int) -> str:
+    """
+    Get the `size` label of a thumbnail box: the smallest bucket its largest side fits in.
+    """
+    side = max(max_width, max_height)
+    return next((str(bucket) for bucket in SIZE_BUCKETS if side <= bucket), "+Inf")
+
+
 resize_image_request_count = Counter(
     name="resize_image_request_count",
     documentation="Number of resize image requests.",
-    labelnames=["max_width", "max_height"],
+    labelnames=["size"],
 )
 
 resize_image_process_count = Counter(
     name="resize_image_process_count",
     documentation="Number of resize image processes.",
-    labelnames=["max_width", "max_height"],
+    labelnames=["size"],
+)
+
+thumbnail_stage_time = Histogram(
+    name="thumbnail_stage_time",
+    documentation="Time spent in each stage of a thumbnail: queue_wait, fetch, decode, resize, "
+    "encode and upload in workers, response in the web process.",
+    labelnames=["stage", "size"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+
+resize_image_path_count = Counter(
+    name="resize_image_path_count",
+    documentation="Number of resize image requests by how they were served "
+    "(index, database, failure, queue, inline, joined, async, unavailable).",
+    labelnames=["path"],
+)
+
+resize_image_inline_running = Gauge(
+    name="resize_image_inline_running",
+    documentation="Number of thumbnails being processed inline by this process.",
+)
+
+resize_image_coalesced_count = Counter(
+    name="resize_image_coalesced_count",
+    documentation="Number of resize image requests joined to an in-flight process.",
+)
+
+thumbnail_cache_hit_count = Counter(
+    name="thumbnail_cache_hit_count",
+    documentation="Number of thumbnail byte cache hits.",
+    labelnames=["tier"],
+)
+
+thumbnail_cache_miss_count = Counter(
+    name="thumbnail_cache_miss_count",
+    documentation="Number of thumbnail byte cache misses.",
+    labelnames=["tier"],
+)
+
+thumbnail_cache_eviction_count = Counter(
+    name="thumbnail_cache_eviction_count",
+    documentation="Number of entries evicted from the thumbnail byte cache.",
+    labelnames=["tier"],
+)
+
+thumbnail_source_cache_request_count = Counter(
+    name="thumbnail_source_cache_request_count",
+    documentation="Number of source image fetches by source cache result (hit, revalidated, miss).",
+    labelnames=["result"],
+)
+
+thumbnail_source_cache_hit_ratio = Gauge(
+    name="thumbnail_source_cache_hit_ratio",
+    documentation="Share of source image fetches served from the source cache by this process.",
+)
+
+thumbnail_source_cache_saved_bytes = Counter(
+    name="thumbnail_source_cache_saved_bytes",
+    documentation="Number of source image bytes not downloaded thanks to the source cache.",
+)
+
+thumbnail_source_cache_eviction_count = Counter(
+    name="thumbnail_source_cache_eviction_count",
+    documentation="Number of entries evicted from the source cache.",
+)
+
+thumbnail_origin_request_count = Counter(
+    name="thumbnail_origin_request_count",
+    documentation="Number of requests to source image origins.",
+)
+
+thumbnail_origin_connection_count = Counter(
+    name="thumbnail_origin_connection_count",
+    documentation="Number of connections opened to source image origins.",
+)
+
+thumbnail_origin_pool_count = Gauge(
+    name="thumbnail_origin_pool_count",
+    documentation="Number of origin hosts with a connection pool in this process.",
+)
+
+thumbnail_index_request_count = Counter(
+    name="thumbnail_index_request_count",
+    documentation="Number of thumbnail index lookups.",
+    labelnames=["result"],
+)
+
+thumbnail_derivation_count = Counter(
+    name="thumbnail_derivation_count",
+    documentation="Number of thumbnails processed, by what they were resized from.",
+    labelnames=["source"],
+)
+
+thumbnail_source_failure_count = Counter(
+    name="thumbnail_source_failure_count",
+    documentation="Number of sources that can not be turned into thumbnails, by reason.",
+    labelnames=["reason"],
+)
+
+thumbnail_duplicate_count = Counter(
+    name="thumbnail_duplicate_count",
+    documentation="Number of thumbnails not processed as the same source was already processed.",
+)
+
+thumbnail_eviction_count = Counter(
+    name="thumbnail_eviction_count",
+    documentation="Number of processed thumbnails evicted from the storage.",
+)
+
+thumbnail_storage_bytes = Gauge(
+    name="thumbnail_storage_bytes",
+    documentation="Number of bytes of stored thumbnail blobs, as of the last eviction.",
+)
+
+thumbnail_hits_flush_lag = Gauge(
+    name="thumbnail_hits_flush_lag",
+    documentation="Age in seconds of the oldest thumbnail access written by the last flush.",
+)
+
+thumbnail_hits_flush_rows = Summary(
+    name="thumbnail_hits_flush_rows",
+    documentation="Number of thumbnails updated per access flush.",
 )
 
-resize_image_process_time = Summary(
-    name="resize_image_process_time",
-    documentation="Time spent processing image.",
-    labelnames=["max_width", "max_height"],
+celery_task_wait_time = Histogram(
+    name="celery_task_wait_time",
+    documentation="Time tasks spent in their queue before a worker started them.",
+    labelnames=["queue"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600),
 )
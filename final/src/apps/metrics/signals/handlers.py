@@ -0,0 +1,74 @@
+import logging
+import time
+
+from celery.signals import before_task_publish, task_prerun, worker_init
+from django.conf import settings
+from prometheus_client import REGISTRY, start_http_server
+from prometheus_client.core import GaugeMetricFamily
+
+from apps.metrics.prometheus import celery_task_wait_time
+
+logger = logging.getLogger(__name__)
+
+PUBLISHED_AT_HEADER = "published_at"
+
+
+def get_queues() -> list[str]:
+    """
+    Get the names of the queues tasks are routed to.
+    """
+    queues = {settings.CELERY_TASK_DEFAULT_QUEUE}
+    queues.update(
+        route["queue"] for route in settings.CELERY_TASK_ROUTES.values() if "queue" in route
+    )
+    return sorted(queues)
+
+
+class QueueDepthCollector:
+    """
+    Report the number of messages waiting in each queue, read from the broker on scrape.
+    """
+
+    def describe(self):
+        # Without it, registering calls `collect` and every process would reach the broker on
+        # import.
+        return []
+
+    def collect(self):
+        from common.celery import get_queue_depths
+
+        try:
+            depths = get_queue_depths(get_queues())
+        except Exception as e:
+            logger.warning(e)
+            return
+        metric = GaugeMetricFamily(
+            "celery_queue_depth", "Number of tasks waiting in a queue.", labels=["queue"]
+        )
+        for queue, depth in depths.items():
+            metric.add_metric([queue], depth)
+        yield metric
+
+
+REGISTRY.register(QueueDepthCollector())
+
+
+@before_task_publish.connect
+def on_before_task_publish(headers: dict, **kwargs) -> None:
+    headers[PUBLISHED_AT_HEADER] = time.time()
+
+
+@task_prerun.connect
+def on_task_prerun(task, **kwargs) -> None:
+    published_at = getattr(task.request, PUBLISHED_AT_HEADER, None)
+    if published_at is None:
+        return
+    queue = (task.request.delivery_info or {}).get("routing_key") or "unknown"
+    celery_task_wait_time.labels(queue=queue).observe(max(time.time() - published_at, 0))
+
+
+@worker_init.connect
+def on_worker_init(**kwargs) -> None:
+    # Workers serve no HTTP, they expose their metrics on a port of their own.
+    if settings.WORKER_METRICS_PORT:
+        start_http_server(settings.WORKER_METRICS_PORT)
@@ -1,3 +1,75 @@
-# from django.test import TestCase
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+from kombu.exceptions import ChannelError
+from prometheus_client import CollectorRegistry
+
+from apps.metrics.prometheus import celery_task_wait_time, get_size_bucket
+from apps.metrics.signals.handlers import (
+    QueueDepthCollector,
+    get_queues,
+    on_before_task_publish,
+    on_task_prerun,
+)
+
+
+class QueueMetricsTestCase(SimpleTestCase):
+    def test_get_queues(self):
+        self.assertEqual(get_queues(), ["bulk", "default", "interactive", "maintenance"])
+
+    @mock.patch("common.celery.app.connection_for_read")
+    def test_queue_depth(self, connection_for_read):
+        def queue_declare(queue, passive):
+            if queue == "maintenance":
+                raise ChannelError("NOT_FOUND")
+            return SimpleNamespace(message_count={"bulk": 7}.get(queue, 1))
+
+        connection = connection_for_read.return_value.__enter__.return_value
+        connection.default_channel.queue_declare.side_effect = queue_declare
+
+        (metric,) = QueueDepthCollector().collect()
+
+        self.assertEqual(
+            {sample.labels["queue"]: sample.value for sample in metric.samples},
+            {"bulk": 7, "default": 1, "interactive": 1, "maintenance": 0},
+        )
+
+    @mock.patch("common.celery.app.connection_for_read")
+    def test_register_does_not_collect(self, connection_for_read):
+        CollectorRegistry().register(QueueDepthCollector())
+
+        connection_for_read.assert_not_called()
+
+    @mock.patch("common.celery.app.connection_for_read")
+    def test_queue_depth_broker_down(self, connection_for_read):
+        connection = connection_for_read.return_value.__enter__.return_value
+        connection.ensure_connection.side_effect = ConnectionError()
+
+        self.assertEqual(list(QueueDepthCollector().collect()), [])
+
+    @mock.patch("apps.metrics.signals.handlers.time.time")
+    def test_task_wait_time(self, time):
+        headers = {}
+        time.return_value = 100.0
+        on_before_task_publish(headers=headers)
+        time.return_value = 102.5
+        task = SimpleNamespace(
+            request=SimpleNamespace(
+                published_at=headers["published_at"], delivery_info={"routing_key": "bulk"}
+            )
+        )
+        histogram = celery_task_wait_time.labels(queue="bulk")
+        before = histogram._sum.get()
+
+        on_task_prerun(task=task)
+
+        self.assertEqual(histogram._sum.get() - before, 2.5)
+
+
+class SizeBucketTestCase(SimpleTestCase):
+    def test_get_size_bucket(self):
+        self.assertEqual(get_size_bucket(10, 64), "64")
+        self.assertEqual(get_size_bucket(100, 65), "128")
+        self.assertEqual(get_size_bucket(2048, 300), "2048")
+        self.assertEqual(get_size_bucket(99999, 1), "+Inf")
@@ -0,0 +1,120 @@
+import logging
+import time
+from typing import NamedTuple
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+ACCESS_KEY = "thumbnails:accessed"
+HITS_KEY = "thumbnails:hits"
+SINCE_KEY = "thumbnails:hits:since"
+FLUSHING_ACCESS_KEY = "thumbnails:accessed:flushing"
+FLUSHING_HITS_KEY = "thumbnails:hits:flushing"
+FLUSHING_SINCE_KEY = "thumbnails:hits:since:flushing"
+
+# Move the recorded accesses (KEYS[1..3]) to the flushing keys (KEYS[4..6]): a plain RENAME,
+# or a merge when a failed flush left accesses behind (latest access, summed hits, oldest since).
+TAKE_SCRIPT = """
+if redis.call("EXISTS", KEYS[4], KEYS[5], KEYS[6]) == 0 then
+    for i = 1, 3 do
+        if redis.call("EXISTS", KEYS[i]) == 1 then
+            redis.call("RENAME", KEYS[i], KEYS[i + 3])
+        end
+    end
+    return
+end
+redis.call("ZUNIONSTORE", KEYS[4], 2, KEYS[4], KEYS[1], "AGGREGATE", "MAX")
+local hits = redis.call("HGETALL", KEYS[2])
+for i = 1, #hits, 2 do
+    redis.call("HINCRBY", KEYS[5], hits[i], hits[i + 1])
+end
+local since = redis.call("GET", KEYS[3])
+local flushing_since = redis.call("GET", KEYS[6])
+if since and (not flushing_since or tonumber(since) < tonumber(flushing_since)) then
+    redis.call("SET", KEYS[6], since)
+end
+redis.call("DEL", KEYS[1], KEYS[2], KEYS[3])
+"""
+
+
+class Accesses(NamedTuple):
+    # Last access time and number of hits by thumbnail id.
+    thumbnails: dict[int, tuple[float, int]]
+    # Time of the oldest recorded access, `None` when there is none.
+    since: float | None
+
+
+def get_connection():
+    """
+    Get the Redis connection of the access cache, `None` when it is not a django-redis cache.
+    """
+    try:
+        return get_redis_connection(settings.THUMBNAILS_ACCESS_CACHE)
+    except NotImplementedError:
+        return None
+
+
+def record_access(thumbnail_id: int) -> None:
+    """
+    Record that a thumbnail was served: its last access time in a sorted set and its hits in a
+    hash, in a single round trip.
+
+    Nothing is written to the database, the accesses are flushed to it in bulk.
+    """
+    try:
+        connection = get_connection()
+        if connection is None:
+            return
+        now = time.time()
+        pipeline = connection.pipeline(transaction=False)
+        pipeline.zadd(ACCESS_KEY, {thumbnail_id: now})
+        pipeline.hincrby(HITS_KEY, thumbnail_id, 1)
+        pipeline.set(SINCE_KEY, now, nx=True)
+        pipeline.execute()
+    except Exception as e:
+        logger.warning(e)
+
+
+def take_accesses() -> Accesses:
+    """
+    Move the recorded accesses to the flushing keys and read them.
+
+    Accesses left in the flushing keys by a flush that failed are kept and merged with the new
+    ones, they stay there until `ack_accesses` is called.
+    """
+    connection = get_connection()
+    if connection is None:
+        return Accesses({}, None)
+    connection.eval(
+        TAKE_SCRIPT,
+        6,
+        ACCESS_KEY,
+        HITS_KEY,
+        SINCE_KEY,
+        FLUSHING_ACCESS_KEY,
+        FLUSHING_HITS_KEY,
+        FLUSHING_SINCE_KEY,
+    )
+    pipeline = connection.pipeline(transaction=True)
+    pipeline.zrange(FLUSHING_ACCESS_KEY, 0, -1, withscores=True)
+    pipeline.hgetall(FLUSHING_HITS_KEY)
+    pipeline.get(FLUSHING_SINCE_KEY)
+    accessed, hits, since = pipeline.execute()
+    return Accesses(
+        {
+            int(thumbnail_id): (last_access, int(hits.get(thumbnail_id, 0)))
+            for thumbnail_id, last_access in accessed
+        },
+        float(since) if since is not None else None,
+    )
+
+
+def ack_accesses() -> None:
+    """
+    Drop the accesses read by `take_accesses`, once they are written to the database.
+    """
+    connection = get_connection()
+    if connection is not None:
+        connection.delete(FLUSHING_ACCESS_KEY, FLUSHING_HITS_KEY, FLUSHING_SINCE_KEY)
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Thumbnail
+from .models import Thumbnail, ThumbnailBlob
 
 # Register your models here.
 
@@ -11,10 +11,13 @@ class Thumbnaildmin(admin.ModelAdmin):
         "url",
         "max_height",
         "max_width",
+        "format",
         "image",
+        "hits",
+        "accessed",
     )
     search_fields = ("url", "max_height", "max_width")
-    readonly_fields = ("created", "modified")
+    readonly_fields = ("created", "modified", "hits", "accessed")
     fieldsets = (
         (
             None,
@@ -23,11 +26,28 @@ class Thumbnaildmin(admin.ModelAdmin):
                     "url",
                     "max_height",
                     "max_width",
+                    "format",
                     "image",
                 )
             },
         ),
-        ("Metadata", {"fields": ("created", "modified"), "classes": ("collapse",)}),
+        (
+            "Metadata",
+            {"fields": ("created", "modified", "hits", "accessed"), "classes": ("collapse",)},
+        ),
     )
     ordering = ("-created",)
     date_hierarchy = "created"
+
+
+@admin.register(ThumbnailBlob)
+class ThumbnailBlobAdmin(admin.ModelAdmin):
+    list_display = (
+        "checksum",
+        "image",
+        "size",
+        "references",
+    )
+    search_fields = ("checksum",)
+    readonly_fields = ("checksum", "image", "size", "width", "height", "references", "created")
+    ordering = ("-created",)
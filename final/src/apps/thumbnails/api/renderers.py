@@ -0,0 +1,21 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class ImageRenderer(BaseRenderer):
+    """
+    Accept image media types in DRF content negotiation.
+
+    Thumbnails are returned as plain `HttpResponse`s, so only JSON payloads (job, error) are
+    ever rendered and those keep the JSON content type.
+    """
+
+    media_type = "image/*"
+    format = "image"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer = JSONRenderer()
+        response = (renderer_context or {}).get("response")
+        if response is not None:
+            response["Content-Type"] = renderer.media_type
+        return renderer.render(data, renderer_context=renderer_context)
@@ -0,0 +1,38 @@
+from django.conf import settings
+from rest_framework import serializers
+
+from apps.thumbnails.encoding import DEFAULT_FORMAT, is_supported
+
+
+class SizeSerializer(serializers.Serializer):
+    max_width = serializers.IntegerField(min_value=1)
+    max_height = serializers.IntegerField(min_value=1)
+
+
+class BatchItemSerializer(serializers.Serializer):
+    url = serializers.URLField()
+    sizes = serializers.ListField(child=SizeSerializer(), min_length=1)
+
+    def validate_sizes(self, value):
+        if len(value) > settings.THUMBNAILS_BATCH_MAX_SIZES:
+            raise serializers.ValidationError(
+                f"Ensure this field has no more than {settings.THUMBNAILS_BATCH_MAX_SIZES} elements."
+            )
+        return value
+
+
+class BatchSerializer(serializers.Serializer):
+    items = serializers.ListField(child=BatchItemSerializer(), min_length=1)
+    format = serializers.CharField(default=DEFAULT_FORMAT)
+
+    def validate_format(self, value):
+        if not is_supported(value):
+            raise serializers.ValidationError(f"Unsupported format: {value}.")
+        return value
+
+    def validate_items(self, value):
+        if len(value) > settings.THUMBNAILS_BATCH_MAX_ITEMS:
+            raise serializers.ValidationError(
+                f"Ensure this field has no more than {settings.THUMBNAILS_BATCH_MAX_ITEMS} elements."
+            )
+        return value
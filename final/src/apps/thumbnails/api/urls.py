@@ -1,10 +1,12 @@
-from django.urls import re_path
+from django.urls import path, re_path
 
 from apps.thumbnails.api import views
 
 app_name = "apps.thumbnails"
 
 urlpatterns = [
+    path("batch/", views.batch, name="batch"),
+    path("jobs/<str:job_id>/", views.job, name="job"),
     re_path(
         r"^(?P<max_height>\d+)x(?P<max_width>\d+)/(?P<url>.+)/$", views.resize, name="thumbnail"
     ),
@@ -1,3 +1,5 @@
-__all__ = ["resize"]
+__all__ = ["batch", "job", "resize"]
 
+from .batch import batch
+from .job import job
 from .resize import resize
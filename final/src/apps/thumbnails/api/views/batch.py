@@ -0,0 +1,130 @@
+import logging
+from collections import defaultdict
+
+from celery import group
+from django.conf import settings
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
+
+from apps.thumbnails.api.serializers import BatchSerializer
+from apps.thumbnails.failures import get_failures
+from apps.thumbnails.models import Thumbnail, get_thumbnail_key
+from apps.thumbnails.notifications import reset
+from apps.thumbnails.singleflight import release, start_or_join
+from apps.thumbnails.tasks import process_thumbnails
+from common.api.responses import OKResponse
+from common.api.serializers import validate_serializer_or_raise_exception
+
+logger = logging.getLogger(__name__)
+
+
+@swagger_auto_schema(
+    methods=["POST"],
+    request_body=BatchSerializer,
+)
+@api_view(["POST"])
+@permission_classes([permissions.AllowAny])
+def batch(request) -> Response:
+    """
+    Request thumbnails of many images and sizes at once.
+
+    Existing thumbnails are reported as `ready`, the missing ones are processed in the
+    background and reported as `pending`, the ones of sources known to be bad as `failed`.
+
+    The `thumbnail` URLs negotiate their format with the `Accept` header like any resize
+    request: clients must accept the batch `format` to get the thumbnails processed here.
+    """
+
+    serializer = BatchSerializer(data=request.data)
+    validate_serializer_or_raise_exception(serializer)
+    items = serializer.validated_data["items"]
+    format = serializer.validated_data["format"]
+
+    keys = {
+        (item["url"], size["max_width"], size["max_height"]): get_thumbnail_key(
+            item["url"], size["max_width"], size["max_height"], format
+        )
+        for item in items
+        for size in item["sizes"]
+    }
+    existing = set(
+        Thumbnail.objects.filter(key__in=keys.values())
+        .exclude(image="")
+        .values_list("key", flat=True)
+    )
+    failures = get_failures([item["url"] for item in items])
+
+    misses = defaultdict(set)
+    results = []
+    for item in items:
+        sizes = []
+        for size in item["sizes"]:
+            if keys[(item["url"], size["max_width"], size["max_height"])] in existing:
+                status = "ready"
+            elif item["url"] in failures:
+                status = "failed"
+            else:
+                status = "pending"
+                misses[item["url"]].add((size["max_width"], size["max_height"]))
+            sizes.append(
+                {
+                    "max_width": size["max_width"],
+                    "max_height": size["max_height"],
+                    "status": status,
+                    "thumbnail": reverse(
+                        "apps.thumbnails:thumbnail",
+                        kwargs={
+                            "max_height": size["max_height"],
+                            "max_width": size["max_width"],
+                            "url": item["url"],
+                        },
+                        request=request,
+                    ),
+                }
+            )
+        results.append({"url": item["url"], "sizes": sizes})
+
+    if misses:
+        dispatch_misses(misses, format)
+
+    return OKResponse({"items": results})
+
+
+def dispatch_misses(misses: dict[str, set[tuple[int, int]]], format: str) -> None:
+    """
+    Process missing thumbnails in the background, unless a task already processes them.
+
+    The keys are leased like resize requests do, so a resize request of a pending thumbnail
+    joins the batch task instead of dispatching another one.
+    """
+    thumbnails = Thumbnail.objects.get_or_insert_many(
+        [(url, *size) for url, sizes in misses.items() for size in sizes], format
+    )
+    leased = defaultdict(set)
+    flights = {}
+    for url, sizes in misses.items():
+        for size in sizes:
+            key = get_thumbnail_key(url, *size, format)
+            flight = start_or_join(key, thumbnails[key].id, lambda task_id: None)
+            if flight.leader:
+                flights[key] = flight.task_id
+                leased[url].add(size)
+    if not leased:
+        return
+
+    # Forget how previous processes of the keys ended (before an eviction...).
+    reset(*flights)
+    try:
+        group(
+            process_thumbnails.s(url, [list(size) for size in sorted(sizes)], format)
+            for url, sizes in leased.items()
+        ).apply_async(
+            queue=settings.THUMBNAILS_BULK_QUEUE, priority=settings.THUMBNAILS_BATCH_PRIORITY
+        )
+    except Exception:
+        for key, task_id in flights.items():
+            release(key, task_id)
+        raise
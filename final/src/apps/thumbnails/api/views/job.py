@@ -0,0 +1,73 @@
+import logging
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseRedirect
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import permissions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
+
+from apps.thumbnails.failures import failure_response, get_failure
+from apps.thumbnails.jobs import get_job_thumbnail_id
+from apps.thumbnails.models import Thumbnail
+from apps.thumbnails.notifications import FAILED, get_statuses
+from apps.thumbnails.singleflight import release
+from common.api.responses import OKResponse
+
+logger = logging.getLogger(__name__)
+
+
+def job_accepted_response(request, job_id: str) -> Response:
+    """
+    Build the `202 Accepted` response pointing to the job status endpoint.
+    """
+    return OKResponse(
+        {"job_id": job_id, "status": "pending"},
+        status=status.HTTP_202_ACCEPTED,
+        headers={
+            "Location": reverse("apps.thumbnails:job", kwargs={"job_id": job_id}, request=request),
+            "Retry-After": str(settings.THUMBNAILS_JOB_RETRY_AFTER),
+        },
+    )
+
+
+@swagger_auto_schema(
+    methods=["GET"],
+)
+@api_view(["GET"])
+@permission_classes([permissions.AllowAny])
+def job(request, job_id) -> Response:
+    """
+    Get the status of a resize job. Redirects to the thumbnail once it is ready.
+    """
+
+    thumbnail_id = get_job_thumbnail_id(job_id)
+    thumbnail = Thumbnail.objects.filter(id=thumbnail_id).first() if thumbnail_id else None
+
+    if thumbnail is None:
+        return HttpResponse("Not Found", status=404)
+
+    if thumbnail.image:
+        return HttpResponseRedirect(
+            reverse(
+                "apps.thumbnails:thumbnail",
+                kwargs={
+                    "max_height": thumbnail.max_height,
+                    "max_width": thumbnail.max_width,
+                    "url": thumbnail.url,
+                },
+                request=request,
+            ),
+            status=status.HTTP_303_SEE_OTHER,
+        )
+
+    if get_statuses([thumbnail.key]).get(thumbnail.key) == FAILED:
+        release(thumbnail.key, job_id)
+        thumbnail.delete()
+        failure = get_failure(thumbnail.url)
+        if failure is not None:
+            return failure_response(failure)
+        return HttpResponse("Not Found", status=404)
+
+    return job_accepted_response(request, job_id)
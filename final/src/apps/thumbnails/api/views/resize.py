@@ -1,56 +1,175 @@
 import logging
-import time
 
-from celery.result import AsyncResult
+from django.conf import settings
 from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
 from drf_yasg.utils import swagger_auto_schema
+from kombu.exceptions import OperationalError
 from rest_framework import permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
 from apps.metrics.prometheus import (
+    get_size_bucket,
+    resize_image_path_count,
     resize_image_process_count,
-    resize_image_process_time,
     resize_image_request_count,
+    thumbnail_stage_time,
 )
-from apps.thumbnails.models import Thumbnail
+from apps.thumbnails.access import record_access
+from apps.thumbnails.api.renderers import ImageRenderer
+from apps.thumbnails.delivery import get_delivery
+from apps.thumbnails.encoding import negotiate_format
+from apps.thumbnails.failures import failure_response, get_failure
+from apps.thumbnails.index import delete_index_entries
+from apps.thumbnails.inline import (
+    acquire_slot,
+    broker_failed,
+    prefers_inline,
+    run_inline,
+)
+from apps.thumbnails.jobs import register_job
+from apps.thumbnails.models import Thumbnail, get_thumbnail_key
+from apps.thumbnails.notifications import reset, wait_for
+from apps.thumbnails.singleflight import release, start_or_join
 from apps.thumbnails.tasks import process_thumbnail
 
+from .job import job_accepted_response
+
 logger = logging.getLogger(__name__)
 
 
+def prefers_async(request) -> bool:
+    """
+    Check whether the client asked not to wait for the thumbnail (RFC 7240).
+    """
+    if settings.THUMBNAILS_RESIZE_ASYNC:
+        return True
+    preferences = request.headers.get("Prefer", "").split(",")
+    return any(
+        preference.split(";")[0].strip().lower() == "respond-async" for preference in preferences
+    )
+
+
 @swagger_auto_schema(
     methods=["GET"],
 )
 @api_view(["GET"])
 @permission_classes([permissions.AllowAny])
+@renderer_classes([JSONRenderer, ImageRenderer])
 def resize(request, max_height, max_width, url) -> Response:
     """
-    Resize an image.
+    Resize an image. The output format is negotiated with the `Accept` header.
     """
+    max_width, max_height = int(max_width), int(max_height)
+    size = get_size_bucket(max_width, max_height)
+    with thumbnail_stage_time.labels(stage="response", size=size).time():
+        response = _resize(request, max_height, max_width, url)
+    patch_vary_headers(response, ["Accept"])
+    return response
 
-    resize_image_request_count.labels(max_width=max_width, max_height=max_height).inc()
 
-    thumbnail, _ = Thumbnail.objects.get_or_create(
-        max_height=max_height, max_width=max_width, url=url
-    )
+def _resize(request, max_height: int, max_width: int, url) -> Response:
 
-    if not thumbnail.image:
-        resize_image_process_count.labels(max_width=max_width, max_height=max_height).inc()
-        begin_time = time.time()
-        result: AsyncResult = process_thumbnail.apply_async(args=[thumbnail.id])
+    size = get_size_bucket(max_width, max_height)
+    resize_image_request_count.labels(size=size).inc()
+
+    format = negotiate_format(request.headers.get("Accept", ""))
+
+    # Hits are served from the index without touching the database.
+    key = get_thumbnail_key(url, max_width, max_height, format)
+    thumbnail = Thumbnail.objects.get_indexed(key)
+    if thumbnail is not None:
         try:
-            result.wait()
+            response = get_delivery().respond(request, thumbnail)
         except Exception as e:
-            logger.error(e)
-        end_time = time.time()
-        resize_image_process_time.labels(max_width=max_width, max_height=max_height).observe(
-            end_time - begin_time
-        )
-        thumbnail.refresh_from_db()
+            # A stale entry (failed deletion, re-index racing an eviction) points at a deleted
+            # file: forget it and fall back to the database.
+            logger.warning(e)
+            delete_index_entries(key)
+        else:
+            resize_image_path_count.labels(path="index").inc()
+            record_access(thumbnail.id)
+            return response
 
+    # Sources known to be bad are answered without a database write or a task.
+    failure = get_failure(url)
+    if failure is not None:
+        resize_image_path_count.labels(path="failure").inc()
+        return failure_response(failure)
+
+    thumbnail = Thumbnail.objects.get_or_insert(url, max_width, max_height, format)
     if thumbnail.image:
-        return HttpResponse(thumbnail.image.read(), content_type="image/jpeg")
+        resize_image_path_count.labels(path="database").inc()
+        thumbnail.index()
+
+    if not thumbnail.image:
+        key = thumbnail.key
+        respond_async = prefers_async(request)
+        inline = False
+
+        def dispatch(task_id: str) -> None:
+            nonlocal inline
+            # Forget how a previous process of the key ended (before an eviction...).
+            reset(key)
+            inline = not respond_async and prefers_inline(thumbnail) and acquire_slot()
+            if inline:
+                return
+            try:
+                process_thumbnail.apply_async(
+                    args=[thumbnail.id],
+                    task_id=task_id,
+                    queue=settings.THUMBNAILS_INTERACTIVE_QUEUE,
+                )
+            except OperationalError:
+                broker_failed()
+                inline = not respond_async and acquire_slot()
+                if not inline:
+                    raise
+
+        try:
+            flight = start_or_join(key, thumbnail.id, dispatch)
+        except OperationalError as e:
+            logger.error(e)
+            resize_image_path_count.labels(path="unavailable").inc()
+            return HttpResponse(
+                "Service Unavailable",
+                status=503,
+                headers={"Retry-After": str(settings.THUMBNAILS_JOB_RETRY_AFTER)},
+            )
+        if flight.leader:
+            resize_image_process_count.labels(size=size).inc()
+
+        if respond_async:
+            resize_image_path_count.labels(path="async").inc()
+            register_job(flight.task_id, flight.thumbnail_id)
+            return job_accepted_response(request, flight.task_id)
+
+        if inline:
+            resize_image_path_count.labels(path="inline").inc()
+            run_inline(thumbnail)
+        else:
+            resize_image_path_count.labels(path="queue" if flight.leader else "joined").inc()
+            if wait_for(key, settings.THUMBNAILS_FLIGHT_LEASE) is None:
+                # The task may still be queued or running: keep the row and the lease, the
+                # client polls the job instead.
+                logger.warning(f"Timed out waiting for thumbnail {key}")
+                register_job(flight.task_id, flight.thumbnail_id)
+                return job_accepted_response(request, flight.task_id)
+
+        thumbnail = Thumbnail.objects.filter(id=flight.thumbnail_id).first()
+
+        if thumbnail is None or not thumbnail.image:
+            release(key, flight.task_id)
+
+    if thumbnail is not None and thumbnail.image:
+        record_access(thumbnail.id)
+        return get_delivery().respond(request, thumbnail)
     else:
-        thumbnail.delete()
+        if thumbnail is not None:
+            thumbnail.delete()
+        failure = get_failure(url)
+        if failure is not None:
+            return failure_response(failure)
         return HttpResponse("Not Found", status=404)
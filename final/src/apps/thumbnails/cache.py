@@ -0,0 +1,128 @@
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable
+
+from django.conf import settings
+from django.core.cache import caches
+
+from apps.metrics.prometheus import (
+    thumbnail_cache_eviction_count,
+    thumbnail_cache_hit_count,
+    thumbnail_cache_miss_count,
+)
+
+logger = logging.getLogger(__name__)
+
+SHARED_CACHE_KEY = "thumbnails:bytes:{key}"
+
+
+class LRUByteCache:
+    """
+    In-process least recently used cache bounded by the total size of the values.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+                thumbnail_cache_eviction_count.labels(tier="local").inc()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            value = self._entries.pop(key, None)
+            if value is not None:
+                self.size -= len(value)
+
+
+class ThumbnailByteCache:
+    """
+    Read-through cache of thumbnail bytes: an in-process LRU in front of a shared cache.
+    """
+
+    def __init__(self, local: LRUByteCache, shared_alias: str, ttl: int, max_entry_bytes: int):
+        self.local = local
+        self.shared = caches[shared_alias]
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes
+
+    def get(self, key: str, loader: Callable[[], bytes]) -> bytes:
+        """
+        Get the bytes of a key, calling `loader` only when both tiers miss.
+        """
+        value = self.local.get(key)
+        if value is not None:
+            thumbnail_cache_hit_count.labels(tier="local").inc()
+            return value
+        thumbnail_cache_miss_count.labels(tier="local").inc()
+
+        try:
+            value = self.shared.get(SHARED_CACHE_KEY.format(key=key))
+        except Exception as e:
+            logger.warning(e)
+            value = None
+        if value is not None:
+            thumbnail_cache_hit_count.labels(tier="shared").inc()
+            self.local.set(key, value)
+            return value
+        thumbnail_cache_miss_count.labels(tier="shared").inc()
+
+        value = loader()
+        if len(value) <= self.max_entry_bytes:
+            try:
+                self.shared.set(SHARED_CACHE_KEY.format(key=key), value, self.ttl)
+            except Exception as e:
+                logger.warning(e)
+        self.local.set(key, value)
+        return value
+
+    def invalidate(self, key: str) -> None:
+        """
+        Drop a key from both tiers, counting a shared eviction when the shared tier held it.
+        """
+        self.local.delete(key)
+        try:
+            deleted = self.shared.delete(SHARED_CACHE_KEY.format(key=key))
+        except Exception as e:
+            logger.warning(e)
+            return
+        if deleted:
+            thumbnail_cache_eviction_count.labels(tier="shared").inc()
+
+
+@lru_cache(maxsize=None)
+def get_byte_cache() -> ThumbnailByteCache:
+    """
+    Get the thumbnail byte cache of this process.
+    """
+    return ThumbnailByteCache(
+        local=LRUByteCache(settings.THUMBNAILS_LOCAL_CACHE_MAX_BYTES),
+        shared_alias=settings.THUMBNAILS_SHARED_CACHE,
+        ttl=settings.THUMBNAILS_SHARED_CACHE_TTL,
+        max_entry_bytes=settings.THUMBNAILS_SHARED_CACHE_MAX_ENTRY_BYTES,
+    )
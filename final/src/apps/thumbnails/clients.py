@@ -0,0 +1,95 @@
+import logging
+import os
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from apps.metrics.prometheus import (
+    thumbnail_origin_connection_count,
+    thumbnail_origin_pool_count,
+    thumbnail_origin_request_count,
+)
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_session: requests.Session | None = None
+_session_pid: int | None = None
+
+
+class CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        thumbnail_origin_connection_count.inc()
+        return super()._new_conn()
+
+
+class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        thumbnail_origin_connection_count.inc()
+        return super()._new_conn()
+
+
+class OriginAdapter(HTTPAdapter):
+    """
+    Adapter whose pools count the connections they open.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": CountingHTTPConnectionPool,
+            "https": CountingHTTPSConnectionPool,
+        }
+
+
+def create_session() -> requests.Session:
+    """
+    Create a session keeping connections alive in a pool per origin host.
+
+    Idempotent requests are retried on connection errors, read errors and `502`, `503`, `504`.
+    """
+    adapter = OriginAdapter(
+        pool_connections=settings.THUMBNAILS_HTTP_POOL_HOSTS,
+        pool_maxsize=settings.THUMBNAILS_HTTP_POOL_MAXSIZE,
+        max_retries=Retry(
+            total=settings.THUMBNAILS_HTTP_RETRIES,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=("GET", "HEAD"),
+            backoff_factor=0.2,
+            raise_on_status=False,
+        ),
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    Get the session of this process, a forked worker never reuses the parent's connections.
+    """
+    global _session, _session_pid
+
+    with _lock:
+        if _session is None or _session_pid != os.getpid():
+            _session = create_session()
+            _session_pid = os.getpid()
+        return _session
+
+
+def origin_get(url: str, **kwargs) -> requests.Response:
+    """
+    GET an origin URL through the pooled session.
+    """
+    session = get_session()
+    response = session.get(url, **kwargs)
+
+    thumbnail_origin_request_count.inc()
+    adapter = session.get_adapter(url)
+    thumbnail_origin_pool_count.set(len(adapter.poolmanager.pools))
+    return response
@@ -0,0 +1,95 @@
+import logging
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseRedirect
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from utils.patterns.class_registry import ClassRegistry
+
+from .cache import get_byte_cache
+from .encoding import get_content_type
+from .models import Thumbnail
+from .responses import get_validators, patch_thumbnail_headers, thumbnail_response
+
+logger = logging.getLogger(__name__)
+
+
+class Delivery:
+    """
+    Way of delivering the bytes of an existing thumbnail to the client.
+    """
+
+    mode: str
+
+    def respond(self, request, thumbnail: Thumbnail) -> HttpResponse:
+        raise NotImplementedError()
+
+
+delivery_registry = ClassRegistry[Delivery](attr_name="mode", unique=True)
+
+
+def read_image(image) -> bytes:
+    """
+    Read the bytes of an image field from the storage.
+    """
+    with image.open("rb") as file:
+        return file.read()
+
+
+@delivery_registry.register
+class ProxyDelivery(Delivery):
+    """
+    Stream the bytes through Django, reading them from the byte cache or the storage.
+    """
+
+    mode = "proxy"
+
+    def respond(self, request, thumbnail: Thumbnail) -> HttpResponse:
+        return thumbnail_response(
+            request,
+            thumbnail,
+            lambda: get_byte_cache().get(thumbnail.image.name, lambda: read_image(thumbnail.image)),
+            content_type=get_content_type(thumbnail.format),
+        )
+
+
+@delivery_registry.register
+class XAccelDelivery(Delivery):
+    """
+    Let nginx serve the file from an internal location with `X-Accel-Redirect`.
+    """
+
+    mode = "x-accel"
+
+    def respond(self, request, thumbnail: Thumbnail) -> HttpResponse:
+        etag, last_modified = get_validators(thumbnail)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = HttpResponse(content_type=get_content_type(thumbnail.format))
+            response.headers["X-Accel-Redirect"] = settings.THUMBNAILS_X_ACCEL_LOCATION + quote(
+                thumbnail.image.name
+            )
+        return patch_thumbnail_headers(response, etag, last_modified)
+
+
+@delivery_registry.register
+class RedirectDelivery(Delivery):
+    """
+    Redirect to the storage URL of the file, presigned when the storage is `MediaStorage`.
+    """
+
+    mode = "redirect"
+
+    def respond(self, request, thumbnail: Thumbnail) -> HttpResponse:
+        response = HttpResponseRedirect(thumbnail.image.url)
+        # The presigned URL expires, so the redirect itself may only be cached for a short time.
+        patch_cache_control(response, public=True, max_age=settings.THUMBNAILS_REDIRECT_MAX_AGE)
+        return response
+
+
+def get_delivery() -> Delivery:
+    """
+    Get the delivery of the configured `THUMBNAILS_DELIVERY_MODE`.
+    """
+    return delivery_registry[settings.THUMBNAILS_DELIVERY_MODE]
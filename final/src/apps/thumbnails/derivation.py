@@ -0,0 +1,74 @@
+import hashlib
+import logging
+from typing import NamedTuple
+
+from django.conf import settings
+
+from apps.metrics.prometheus import thumbnail_derivation_count
+
+from .cache import get_byte_cache
+from .delivery import read_image
+from .models import Thumbnail
+from .utils import fetch_source
+
+logger = logging.getLogger(__name__)
+
+
+class Source(NamedTuple):
+    content: bytes
+    # Hash of the origin image bytes, empty when unknown.
+    checksum: str
+
+
+def can_derive(derivative: Thumbnail, size: tuple[int, int]) -> bool:
+    """
+    Check whether a thumbnail of a box can be resized from a derivative of the same source.
+
+    The derivative must be at least `THUMBNAILS_DERIVE_MIN_RATIO` times larger than the result,
+    so that resampling an already resampled (and lossy encoded) image stays invisible.
+    """
+    ratio = settings.THUMBNAILS_DERIVE_MIN_RATIO
+    if not ratio or not derivative.width or not derivative.height:
+        return False
+    max_width, max_height = size
+    scale = min(max_width / derivative.width, max_height / derivative.height)
+    return scale * ratio <= 1
+
+
+def plan_derivation(thumbnail: Thumbnail) -> Thumbnail | None:
+    """
+    Find the smallest processed thumbnail of the same URL the thumbnail can be resized from.
+    """
+    size = (thumbnail.max_width, thumbnail.max_height)
+    derivatives = [
+        derivative
+        for derivative in Thumbnail.objects.filter(url=thumbnail.url, width__isnull=False)
+        .exclude(id=thumbnail.id)
+        .exclude(image="")
+        .only("id", "image", "width", "height", "source_checksum")
+        if can_derive(derivative, size)
+    ]
+    return min(
+        derivatives, key=lambda derivative: derivative.width * derivative.height, default=None
+    )
+
+
+def fetch_thumbnail_source(thumbnail: Thumbnail) -> Source:
+    """
+    Get the image to resize a thumbnail from: a larger derivative when possible, else the origin.
+    """
+    derivative = plan_derivation(thumbnail)
+    if derivative is not None:
+        try:
+            content = get_byte_cache().get(
+                derivative.image.name, lambda: read_image(derivative.image)
+            )
+        except Exception as e:
+            logger.warning(e)
+        else:
+            thumbnail_derivation_count.labels(source="derivative").inc()
+            return Source(content, derivative.source_checksum)
+
+    thumbnail_derivation_count.labels(source="origin").inc()
+    content = fetch_source(thumbnail.url)
+    return Source(content, hashlib.sha256(content).hexdigest())
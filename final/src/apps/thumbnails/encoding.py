@@ -0,0 +1,94 @@
+from io import BytesIO
+
+from django.conf import settings
+from PIL import features
+from PIL.Image import Image as PILImage
+
+DEFAULT_FORMAT = "jpeg"
+
+# Keys of a profile that are not Pillow save options.
+PROFILE_KEYS = ("format", "content_type", "strip_metadata")
+
+# Modes each Pillow format can save, other modes are converted to the first one.
+FORMAT_MODES = {
+    "JPEG": ("RGB", "L", "CMYK"),
+    "WEBP": ("RGB", "RGBA"),
+    "AVIF": ("RGB", "RGBA"),
+}
+
+
+def get_profile(name: str) -> dict:
+    """
+    Get an encoding profile by name.
+    """
+    return settings.THUMBNAILS_ENCODING_PROFILES[name]
+
+
+def get_content_type(name: str) -> str:
+    return get_profile(name)["content_type"]
+
+
+def is_supported(name: str) -> bool:
+    """
+    Check that a profile is configured and that Pillow was built with its codec.
+    """
+    if name not in settings.THUMBNAILS_ENCODING_PROFILES:
+        return False
+    pillow_format = get_profile(name)["format"]
+    return pillow_format not in ("WEBP", "AVIF") or bool(features.check(pillow_format.lower()))
+
+
+def parse_accept(accept: str) -> dict[str, float]:
+    """
+    Parse an `Accept` header into media type quality values.
+    """
+    qualities = {}
+    for media_range in accept.split(","):
+        media_type, *params = media_range.strip().split(";")
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[media_type.strip().lower()] = quality
+    return qualities
+
+
+def negotiate_format(accept: str) -> str:
+    """
+    Pick the output format from an `Accept` header.
+
+    Formats of `THUMBNAILS_FORMATS` are tried in order and only when listed explicitly: a
+    wildcard does not mean that a client can decode AVIF or WebP. JPEG is the fallback.
+    """
+    qualities = parse_accept(accept)
+    for name in settings.THUMBNAILS_FORMATS:
+        if qualities.get(get_content_type(name), 0) > 0 and is_supported(name):
+            return name
+    return DEFAULT_FORMAT
+
+
+def encode_image(image: PILImage, name: str) -> bytes:
+    """
+    Encode an image with an encoding profile.
+    """
+    profile = get_profile(name)
+    pillow_format = profile["format"]
+    options = {key: value for key, value in profile.items() if key not in PROFILE_KEYS}
+    if not profile.get("strip_metadata", True):
+        for key in ("exif", "icc_profile"):
+            if image.info.get(key):
+                options[key] = image.info[key]
+
+    modes = FORMAT_MODES.get(pillow_format)
+    if modes and image.mode not in modes:
+        image = image.convert(
+            "RGBA" if "RGBA" in modes and image.has_transparency_data else modes[0]
+        )
+
+    image_io = BytesIO()
+    image.save(image_io, format=pillow_format, **options)
+    return image_io.getvalue()
@@ -0,0 +1,21 @@
+class SourceError(Exception):
+    """
+    The source image can not be turned into a thumbnail.
+
+    Such failures are permanent: they are not retried, and are answered with `status_code` until
+    they expire from the failure cache (see `failures.py`).
+    """
+
+    status_code = 422
+
+
+class SourceTooLarge(SourceError):
+    pass
+
+
+class SourceNotImage(SourceError):
+    pass
+
+
+class SourceNotFound(SourceError):
+    status_code = 404
@@ -0,0 +1,56 @@
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from apps.metrics.prometheus import thumbnail_source_failure_count
+
+from .exceptions import SourceError
+from .utils import normalize_url
+
+logger = logging.getLogger(__name__)
+
+FAILURE_CACHE_KEY = "thumbnails:failure:{digest}"
+
+
+def get_failure_cache_key(url: str) -> str:
+    return FAILURE_CACHE_KEY.format(digest=hashlib.sha256(normalize_url(url).encode()).hexdigest())
+
+
+def remember_failure(url: str, error: SourceError) -> None:
+    """
+    Remember for `THUMBNAILS_FAILURE_TTL` seconds that a source can not be turned into
+    thumbnails, whatever their size and format.
+    """
+    thumbnail_source_failure_count.labels(reason=type(error).__name__).inc()
+    try:
+        caches[settings.THUMBNAILS_FAILURE_CACHE].set(
+            get_failure_cache_key(url),
+            {"status": error.status_code, "reason": str(error)},
+            settings.THUMBNAILS_FAILURE_TTL,
+        )
+    except Exception as e:
+        logger.warning(e)
+
+
+def get_failures(urls: list[str]) -> dict[str, dict]:
+    """
+    Get the remembered failures (status code and reason) of sources by URL.
+    """
+    cache_keys = {get_failure_cache_key(url): url for url in urls}
+    try:
+        failures = caches[settings.THUMBNAILS_FAILURE_CACHE].get_many(list(cache_keys))
+    except Exception as e:
+        logger.warning(e)
+        return {}
+    return {cache_keys[cache_key]: failure for cache_key, failure in failures.items()}
+
+
+def get_failure(url: str) -> dict | None:
+    return get_failures([url]).get(url)
+
+
+def failure_response(failure: dict) -> HttpResponse:
+    return HttpResponse(failure["reason"], status=failure["status"])
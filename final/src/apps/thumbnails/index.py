@@ -0,0 +1,43 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+
+from apps.metrics.prometheus import thumbnail_index_request_count
+
+logger = logging.getLogger(__name__)
+
+INDEX_CACHE_KEY = "thumbnails:index:{key}"
+
+
+def get_index_entry(key: str) -> dict | None:
+    """
+    Get the indexed storage name, size and validators of a thumbnail key.
+
+    Errors of the index cache count as misses, the database is the source of truth.
+    """
+    try:
+        entry = caches[settings.THUMBNAILS_INDEX_CACHE].get(INDEX_CACHE_KEY.format(key=key))
+    except Exception as e:
+        logger.warning(e)
+        entry = None
+    thumbnail_index_request_count.labels(result="miss" if entry is None else "hit").inc()
+    return entry
+
+
+def set_index_entry(key: str, entry: dict) -> None:
+    try:
+        caches[settings.THUMBNAILS_INDEX_CACHE].set(
+            INDEX_CACHE_KEY.format(key=key), entry, settings.THUMBNAILS_INDEX_TTL
+        )
+    except Exception as e:
+        logger.warning(e)
+
+
+def delete_index_entries(*keys: str) -> None:
+    try:
+        caches[settings.THUMBNAILS_INDEX_CACHE].delete_many(
+            [INDEX_CACHE_KEY.format(key=key) for key in keys]
+        )
+    except Exception as e:
+        logger.warning(e)
@@ -0,0 +1,125 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from apps.metrics.prometheus import resize_image_inline_running
+from common.celery import get_queue_depths
+
+from .derivation import plan_derivation
+from .exceptions import SourceError
+from .failures import remember_failure
+from .models import Thumbnail
+from .notifications import FAILED, notify
+from .sources import get_source_cache
+from .tasks import make_thumbnail
+from .utils import normalize_url
+
+logger = logging.getLogger(__name__)
+
+DEPTH_SAMPLE_INTERVAL = 1
+
+_lock = threading.Lock()
+_running = 0
+_broker_failed_at = float("-inf")
+_depth_sampled_at = float("-inf")
+_depth = 0
+
+
+def acquire_slot() -> bool:
+    """
+    Take one of the `THUMBNAILS_INLINE_SLOTS` inline slots of this process, without waiting.
+    """
+    global _running
+
+    with _lock:
+        if _running >= settings.THUMBNAILS_INLINE_SLOTS:
+            return False
+        _running += 1
+    resize_image_inline_running.inc()
+    return True
+
+
+def release_slot() -> None:
+    global _running
+
+    with _lock:
+        _running -= 1
+    resize_image_inline_running.dec()
+
+
+def broker_failed() -> None:
+    """
+    Record that the broker could not be reached.
+    """
+    global _broker_failed_at
+
+    _broker_failed_at = time.monotonic()
+
+
+def is_broker_down() -> bool:
+    return time.monotonic() - _broker_failed_at < settings.THUMBNAILS_INLINE_BROKER_BACKOFF
+
+
+def is_queue_busy() -> bool:
+    """
+    Check whether more than `THUMBNAILS_INLINE_QUEUE_DEPTH` tasks wait in the interactive queue.
+    """
+    global _depth, _depth_sampled_at
+
+    if not settings.THUMBNAILS_INLINE_QUEUE_DEPTH:
+        return False
+    if time.monotonic() - _depth_sampled_at >= DEPTH_SAMPLE_INTERVAL:
+        _depth_sampled_at = time.monotonic()
+        queue = settings.THUMBNAILS_INTERACTIVE_QUEUE
+        try:
+            _depth = get_queue_depths([queue])[queue]
+        except Exception as e:
+            logger.warning(e)
+            broker_failed()
+    return _depth > settings.THUMBNAILS_INLINE_QUEUE_DEPTH
+
+
+def is_small_source(thumbnail: Thumbnail) -> bool:
+    """
+    Check whether a thumbnail is known to be resized from a small image: a cached source or a
+    thumbnail of the same URL.
+    """
+    source_cache = get_source_cache()
+    if source_cache is not None:
+        size = source_cache.size(normalize_url(thumbnail.url))
+        if size is not None:
+            return size <= settings.THUMBNAILS_INLINE_MAX_SOURCE_BYTES
+
+    derivative = plan_derivation(thumbnail)
+    return (
+        derivative is not None
+        and derivative.width * derivative.height <= settings.THUMBNAILS_INLINE_MAX_SOURCE_PIXELS
+    )
+
+
+def prefers_inline(thumbnail: Thumbnail) -> bool:
+    """
+    Check whether processing a thumbnail in this process beats a Celery round trip.
+    """
+    if not settings.THUMBNAILS_INLINE_SLOTS:
+        return False
+    return is_broker_down() or is_queue_busy() or is_small_source(thumbnail)
+
+
+def run_inline(thumbnail: Thumbnail) -> None:
+    """
+    Process a thumbnail in this process, in a slot taken with `acquire_slot`.
+
+    There is no retry: a failure is logged and notified to the requests waiting for the thumbnail.
+    """
+    try:
+        make_thumbnail(thumbnail)
+    except Exception as e:
+        logger.error(e)
+        if isinstance(e, SourceError):
+            remember_failure(thumbnail.url, e)
+        notify(FAILED, thumbnail.key)
+    finally:
+        release_slot()
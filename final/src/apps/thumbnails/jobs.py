@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.cache import cache
+
+JOB_CACHE_KEY = "thumbnails:job:{job_id}"
+
+
+def register_job(job_id: str, thumbnail_id: int) -> None:
+    """
+    Remember which thumbnail a resize job is producing.
+    """
+    cache.set(JOB_CACHE_KEY.format(job_id=job_id), thumbnail_id, settings.THUMBNAILS_JOB_TTL)
+
+
+def get_job_thumbnail_id(job_id: str) -> int | None:
+    """
+    Get the thumbnail id of a resize job, if the job is known.
+    """
+    return cache.get(JOB_CACHE_KEY.format(job_id=job_id))
@@ -0,0 +1,209 @@
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import nullcontext
+from itertools import islice
+from typing import Iterable, Iterator
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.thumbnails.encoding import DEFAULT_FORMAT, is_supported
+from apps.thumbnails.models import Thumbnail, get_thumbnail_key
+from apps.thumbnails.notifications import FAILED, Subscription, reset
+from apps.thumbnails.tasks import process_thumbnails
+
+SIZE_RE = re.compile(r"^(?P<max_height>\d+)x(?P<max_width>\d+)$")
+BATCH_SIZE = 1000
+PROGRESS_INTERVAL = 5
+
+
+def parse_size(value: str) -> tuple[int, int]:
+    """
+    Parse a `<max_height>x<max_width>` size, as in the resize URL, into `(max_width, max_height)`.
+    """
+    match = SIZE_RE.match(value)
+    if match is None or not int(match.group("max_height")) or not int(match.group("max_width")):
+        raise ValueError(f"Invalid size: {value}")
+    return int(match.group("max_width")), int(match.group("max_height"))
+
+
+class Command(BaseCommand):
+    help = (
+        "Process the thumbnails listed in a file that do not exist yet. Each line is an image URL "
+        "followed by its sizes (`<max_height>x<max_width>`, as in the resize URL)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", nargs="?", default="-", help="File to read, `-` for stdin.")
+        parser.add_argument(
+            "--size",
+            action="append",
+            default=[],
+            help="Size of the lines without sizes, may be repeated.",
+        )
+        parser.add_argument("--format", default=DEFAULT_FORMAT)
+        parser.add_argument("--queue", default=settings.THUMBNAILS_BULK_QUEUE)
+        parser.add_argument(
+            "--priority",
+            type=int,
+            default=settings.THUMBNAILS_WARM_PRIORITY,
+            help="Task priority, 0 is the highest.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.THUMBNAILS_WARM_CONCURRENCY,
+            help="Maximum number of images being processed at once.",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=int,
+            default=settings.THUMBNAILS_WARM_TIMEOUT,
+            help="Seconds after which an image being processed counts as failed.",
+        )
+
+    def handle(self, *args, **options):
+        format = options["format"]
+        if not is_supported(format):
+            raise CommandError(f"Unsupported format: {format}.")
+        if options["concurrency"] < 1:
+            raise CommandError("The concurrency must be at least 1.")
+        try:
+            default_sizes = [parse_size(size) for size in options["size"]]
+        except ValueError as e:
+            raise CommandError(e)
+
+        self.stats = Counter()
+        self.reported_at = time.monotonic()
+        # Thumbnail keys not processed yet of each enqueued image, and the image of each key.
+        self.in_flight: dict[int, set[str]] = {}
+        self.images: dict[str, int] = {}
+        self.failed: set[int] = set()
+        # URL and deadline of each enqueued image.
+        self.urls: dict[int, str] = {}
+        self.deadlines: dict[int, float] = {}
+        self.subscription = Subscription()
+
+        file = options["file"]
+        with self.subscription, nullcontext(sys.stdin) if file == "-" else open(file) as lines:
+            items = self.read_items(lines, default_sizes)
+            image = 0
+            while batch := list(islice(items, BATCH_SIZE)):
+                for url, sizes in self.get_misses(batch, format):
+                    keys = {get_thumbnail_key(url, *size, format): size for size in sizes}
+                    # Sizes of an image still in flight are processed by its task.
+                    keys = {key: size for key, size in keys.items() if key not in self.images}
+                    if not keys:
+                        continue
+                    self.wait(options["concurrency"] - 1)
+                    image += 1
+                    self.in_flight[image] = set(keys)
+                    self.images.update(dict.fromkeys(keys, image))
+                    self.urls[image] = url
+                    self.deadlines[image] = time.monotonic() + options["timeout"]
+                    reset(*keys)
+                    self.subscription.add(*keys)
+                    process_thumbnails.apply_async(
+                        args=[url, [list(size) for size in keys.values()], format],
+                        queue=options["queue"],
+                        priority=options["priority"],
+                    )
+                    self.stats["enqueued"] += len(keys)
+                self.report()
+            self.wait(0)
+        self.report()
+
+    def read_items(
+        self, lines: Iterable[str], default_sizes: list[tuple[int, int]]
+    ) -> Iterator[tuple[str, list[tuple[int, int]]]]:
+        """
+        Parse the lines into URLs and sizes, skipping blank lines, comments and invalid lines.
+        """
+        for number, line in enumerate(lines, start=1):
+            parts = line.split()
+            if not parts or parts[0].startswith("#"):
+                continue
+            try:
+                sizes = [parse_size(part) for part in parts[1:]] or default_sizes
+            except ValueError as e:
+                sizes = []
+                self.stderr.write(f"Line {number}: {e}")
+            if not sizes:
+                self.stats["invalid"] += 1
+                continue
+            yield parts[0], sizes
+
+    def get_misses(
+        self, batch: list[tuple[str, list[tuple[int, int]]]], format: str
+    ) -> list[tuple[str, list[tuple[int, int]]]]:
+        """
+        Drop the sizes that are already processed, with a single query per batch.
+        """
+        keys = {}
+        for url, sizes in batch:
+            for max_width, max_height in sizes:
+                keys[url, max_width, max_height] = get_thumbnail_key(
+                    url, max_width, max_height, format
+                )
+        existing = set(
+            Thumbnail.objects.filter(key__in=keys.values())
+            .exclude(image="")
+            .values_list("key", flat=True)
+        )
+
+        misses: dict[str, dict[tuple[int, int], None]] = {}
+        for (url, max_width, max_height), key in keys.items():
+            if key in existing:
+                self.stats["existing"] += 1
+            else:
+                misses.setdefault(url, {})[max_width, max_height] = None
+        return [(url, list(sizes)) for url, sizes in misses.items()]
+
+    def wait(self, limit: int) -> None:
+        """
+        Wait until at most `limit` images are in flight, reporting the progress meanwhile.
+        """
+        while len(self.in_flight) > limit:
+            timeout = max(
+                min(self.reported_at + PROGRESS_INTERVAL, *self.deadlines.values())
+                - time.monotonic(),
+                0,
+            )
+            for key, status in self.subscription.wait(timeout).items():
+                image = self.images.pop(key, None)
+                if image is None:
+                    continue
+                if status == FAILED:
+                    self.failed.add(image)
+                self.in_flight[image].discard(key)
+                if not self.in_flight[image]:
+                    self.finish(image, "failed" if image in self.failed else "done")
+            for image, deadline in list(self.deadlines.items()):
+                if deadline <= time.monotonic():
+                    self.stderr.write(f"Timed out: {self.urls[image]}")
+                    self.subscription.discard(*self.in_flight[image])
+                    for key in self.in_flight[image]:
+                        del self.images[key]
+                    self.stats["timed_out"] += 1
+                    self.finish(image, "failed")
+            if time.monotonic() - self.reported_at >= PROGRESS_INTERVAL:
+                self.report()
+
+    def finish(self, image: int, result: str) -> None:
+        del self.in_flight[image], self.urls[image], self.deadlines[image]
+        self.failed.discard(image)
+        self.stats[result] += 1
+
+    def report(self) -> None:
+        self.reported_at = time.monotonic()
+        self.stdout.write(
+            "Sizes: {existing} existing, {enqueued} enqueued, {invalid} invalid lines. "
+            "Images: {done} done, {failed} failed ({timed_out} timed out).".format_map(
+                {
+                    key: self.stats[key]
+                    for key in ("existing", "enqueued", "invalid", "done", "failed", "timed_out")
+                }
+            )
+        )
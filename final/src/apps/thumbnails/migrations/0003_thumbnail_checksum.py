@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("thumbnails", "0002_rename_height_thumbnail_max_height_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="thumbnail",
+            name="checksum",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("thumbnails", "0003_thumbnail_checksum"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="thumbnail",
+            name="format",
+            field=models.CharField(default="jpeg", max_length=8),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("thumbnails", "0004_thumbnail_format"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="thumbnail",
+            name="key",
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,87 @@
+import hashlib
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from django.db import migrations, transaction
+from django.db.models import Count
+
+BATCH_SIZE = 5000
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+# Frozen copies of `apps.thumbnails.utils.normalize_url` and
+# `apps.thumbnails.models.get_thumbnail_key` as of this migration.
+def normalize_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or "").lower()
+    if ":" in netloc:
+        netloc = f"[{netloc}]"
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{parts.port}"
+    userinfo = parts.username or ""
+    if parts.password:
+        userinfo = f"{userinfo}:{parts.password}"
+    if userinfo:
+        netloc = f"{userinfo}@{netloc}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, parts.path or "/", query, ""))
+
+
+def get_thumbnail_key(url: str, max_width: int, max_height: int, format: str) -> str:
+    return hashlib.sha256(
+        f"{normalize_url(url)}\n{int(max_width)}\n{int(max_height)}\n{format}".encode()
+    ).hexdigest()
+
+
+def backfill_keys(apps, schema_editor):
+    Thumbnail = apps.get_model("thumbnails", "Thumbnail")
+    rows = Thumbnail.objects.filter(key__isnull=True).order_by("id")
+
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                rows.filter(id__gt=last_id).only("id", "url", "max_width", "max_height", "format")[
+                    :BATCH_SIZE
+                ]
+            )
+            if not batch:
+                break
+            for thumbnail in batch:
+                thumbnail.key = get_thumbnail_key(
+                    thumbnail.url, thumbnail.max_width, thumbnail.max_height, thumbnail.format
+                )
+            Thumbnail.objects.bulk_update(batch, ["key"])
+        last_id = batch[-1].id
+
+
+def delete_duplicates(apps, schema_editor):
+    """
+    Keep one row per key: the oldest one with an image, else the oldest one.
+
+    Images of the deleted rows are left in the storage.
+    """
+    Thumbnail = apps.get_model("thumbnails", "Thumbnail")
+    duplicated = (
+        Thumbnail.objects.values("key").annotate(count=Count("id")).filter(count__gt=1)
+    ).values_list("key", flat=True)
+
+    for key in duplicated.iterator():
+        with transaction.atomic():
+            rows = list(Thumbnail.objects.filter(key=key).order_by("id").only("id", "image"))
+            keep = next((row for row in rows if row.image), rows[0])
+            Thumbnail.objects.filter(key=key).exclude(id=keep.id).delete()
+
+
+class Migration(migrations.Migration):
+    # Every batch is committed on its own instead of holding one transaction over the table.
+    atomic = False
+
+    dependencies = [
+        ("thumbnails", "0005_thumbnail_key"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_keys, migrations.RunPython.noop),
+        migrations.RunPython(delete_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("thumbnails", "0007_alter_thumbnail_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="thumbnail",
+            name="height",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="thumbnail",
+            name="width",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="thumbnail",
+            name="url",
+            field=models.URLField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("thumbnails", "0008_thumbnail_dimensions"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ThumbnailBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True, db_index=True)),
+                (
+                    "modified",
+                    models.DateTimeField(blank=True, db_index=True, null=True),
+                ),
+                ("checksum", models.CharField(max_length=64, unique=True)),
+                ("image", models.ImageField(upload_to="thumbnails")),
+                ("size", models.IntegerField()),
+                ("width", models.IntegerField()),
+                ("height", models.IntegerField()),
+                ("references", models.IntegerField(default=0)),
+            ],
+            options={
+                "verbose_name": "Thumbnail blob",
+                "verbose_name_plural": "Thumbnail blobs",
+            },
+        ),
+        migrations.AddField(
+            model_name="thumbnail",
+            name="source_checksum",
+            field=models.CharField(blank=True, default="", max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name="thumbnail",
+            index=models.Index(
+                fields=["source_checksum", "max_width", "max_height", "format"],
+                name="thumbnails_source_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("thumbnails", "0009_thumbnail_blobs"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="thumbnail",
+            name="accessed",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
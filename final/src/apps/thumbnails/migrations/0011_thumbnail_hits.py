@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-18 18:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("thumbnails", "0010_thumbnail_accessed"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="thumbnail",
+            name="hits",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -1,17 +1,298 @@
-from django.db import models
+import hashlib
+import logging
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import models, transaction
+from django.db.models import F
+from PIL import Image
 
 from common.models import TimestampedModel
 
+from .cache import get_byte_cache
+from .index import delete_index_entries, get_index_entry, set_index_entry
+from .notifications import DONE, notify
+from .utils import normalize_url
+
+logger = logging.getLogger(__name__)
+
+
+def get_thumbnail_key(url: str, max_width: int, max_height: int, format: str) -> str:
+    """
+    Get the lookup key of a thumbnail: a digest of its normalized URL, size and format.
+
+    Sizes may be given as URL strings, they are cast so `0100` and `100` share a key.
+    """
+    return hashlib.sha256(
+        f"{normalize_url(url)}\n{int(max_width)}\n{int(max_height)}\n{format}".encode()
+    ).hexdigest()
+
+
+class ThumbnailBlobQuerySet(models.QuerySet):
+    def acquire(self, checksum: str) -> "ThumbnailBlob | None":
+        """
+        Take a reference to the blob of a content hash, if it is stored.
+        """
+        with transaction.atomic():
+            blob = self.select_for_update().filter(checksum=checksum).first()
+            if blob is not None:
+                self.filter(id=blob.id).update(references=F("references") + 1)
+                blob.references += 1
+        return blob
+
+    def store(self, content: bytes, format: str) -> "ThumbnailBlob":
+        """
+        Store encoded image bytes once per content hash and take a reference to them.
+        """
+        checksum = hashlib.sha256(content).hexdigest()
+        while True:
+            blob = self.acquire(checksum)
+            if blob is not None:
+                return blob
+
+            width, height = Image.open(BytesIO(content)).size
+            blob = self.model(checksum=checksum, size=len(content), width=width, height=height)
+            # Every upload gets its own name: the file of a released blob with the same bytes may
+            # still be waiting for its deletion, which must not remove this upload.
+            blob.image.save(
+                f"{checksum}.{uuid.uuid4().hex[:12]}.{format}", ContentFile(content), save=False
+            )
+            # A concurrent store of the same bytes may win, the loop then references its blob.
+            self.bulk_create([blob], ignore_conflicts=True)
+            stored = self.filter(checksum=checksum).values_list("image", flat=True).first()
+            if stored != blob.image.name:
+                delete_blob_files([blob.image.name])
+
+    def release(self, *images: tuple[str, str]) -> None:
+        """
+        Drop a reference to the blobs of stored images (checksum and name pairs), deleting the
+        blobs left unused with their files.
+
+        Images stored before blobs have no blob and are left alone.
+        """
+        references = Counter(images)
+        if not references:
+            return
+
+        with transaction.atomic():
+            unused = []
+            for blob in self.select_for_update().filter(
+                checksum__in={checksum for checksum, _ in references}
+            ):
+                count = references[blob.checksum, blob.image.name]
+                if not count:
+                    continue
+                if blob.references > count:
+                    self.filter(id=blob.id).update(references=F("references") - count)
+                else:
+                    unused.append(blob)
+            if unused:
+                self.filter(id__in=[blob.id for blob in unused]).delete()
+                names = [blob.image.name for blob in unused]
+                transaction.on_commit(lambda: delete_blob_files(names))
+
+
+class ThumbnailBlob(TimestampedModel):
+    """
+    Encoded thumbnail image shared by all the thumbnails with the same bytes.
+    """
+
+    checksum = models.CharField(max_length=64, unique=True)
+    image = models.ImageField(upload_to="thumbnails")
+    size = models.IntegerField()
+    width = models.IntegerField()
+    height = models.IntegerField()
+    # Number of thumbnails pointing at the image.
+    references = models.IntegerField(default=0)
+
+    objects = ThumbnailBlobQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Thumbnail blob"
+        verbose_name_plural = "Thumbnail blobs"
+
+    def __str__(self):
+        return self.image.name
+
+
+def delete_blob_file(name: str) -> None:
+    get_byte_cache().invalidate(name)
+    try:
+        ThumbnailBlob._meta.get_field("image").storage.delete(name)
+    except Exception as e:
+        logger.warning(e)
+
+
+def delete_blob_files(names: list[str]) -> None:
+    """
+    Delete blob files from the storage, in parallel, unless a blob still points at them.
+    """
+    names = set(names) - set(
+        ThumbnailBlob.objects.filter(image__in=names).values_list("image", flat=True)
+    )
+    if len(names) <= 1:
+        for name in names:
+            delete_blob_file(name)
+        return
+    with ThreadPoolExecutor(
+        max_workers=min(settings.THUMBNAILS_STORAGE_DELETE_WORKERS, len(names))
+    ) as executor:
+        for _ in executor.map(delete_blob_file, names):
+            pass
+
+
+class ThumbnailQuerySet(models.QuerySet):
+    def get_or_insert(
+        self, url: str, max_width: int, max_height: int, format: str = "jpeg"
+    ) -> "Thumbnail":
+        """
+        Get a thumbnail by its key, inserting it when missing.
+
+        Concurrent inserts of the same key neither fail nor duplicate the row
+        (`INSERT ... ON CONFLICT DO NOTHING`).
+        """
+        key = get_thumbnail_key(url, max_width, max_height, format)
+        thumbnail = self.filter(key=key).first()
+        if thumbnail is None:
+            self.bulk_create(
+                [
+                    self.model(
+                        key=key, url=url, max_width=max_width, max_height=max_height, format=format
+                    )
+                ],
+                ignore_conflicts=True,
+            )
+            thumbnail = self.get(key=key)
+        return thumbnail
+
+    def get_or_insert_many(
+        self, sizes: list[tuple[str, int, int]], format: str = "jpeg"
+    ) -> dict[str, "Thumbnail"]:
+        """
+        Get thumbnails of URL and size triples by key, inserting the missing ones in bulk like
+        `get_or_insert`.
+        """
+        rows = {get_thumbnail_key(url, *size, format): (url, *size) for url, *size in sizes}
+        thumbnails = self.in_bulk(list(rows), field_name="key")
+        missing = [
+            self.model(key=key, url=url, max_width=max_width, max_height=max_height, format=format)
+            for key, (url, max_width, max_height) in rows.items()
+            if key not in thumbnails
+        ]
+        if missing:
+            self.bulk_create(missing, ignore_conflicts=True)
+            thumbnails = self.in_bulk(list(rows), field_name="key")
+        return thumbnails
+
+    def get_indexed(self, key: str) -> "Thumbnail | None":
+        """
+        Get a processed thumbnail from the index, without querying the database.
+
+        The instance only has the fields needed to deliver the image.
+        """
+        entry = get_index_entry(key)
+        if entry is None:
+            return None
+        return self.model(
+            id=entry["id"],
+            key=key,
+            image=entry["name"],
+            format=entry["format"],
+            checksum=entry["checksum"],
+            modified=datetime.fromtimestamp(entry["modified"], tz=timezone.utc),
+        )
+
+    def delete(self):
+        rows = list(self.values_list("key", "checksum", "image"))
+        with transaction.atomic():
+            result = super().delete()
+            ThumbnailBlob.objects.release(
+                *((checksum, image) for _, checksum, image in rows if image)
+            )
+        transaction.on_commit(lambda: delete_index_entries(*(key for key, _, _ in rows)))
+        return result
+
 
 class Thumbnail(TimestampedModel):
-    url = models.URLField()
+    key = models.CharField(max_length=64, unique=True, editable=False)
+    url = models.URLField(db_index=True)
     max_height = models.IntegerField()
     max_width = models.IntegerField()
     image = models.ImageField(upload_to="thumbnails", blank=True, null=True)
+    format = models.CharField(max_length=8, default="jpeg")
+    checksum = models.CharField(max_length=64, blank=True, default="")
+    # Hash of the source image bytes the thumbnail was processed from.
+    source_checksum = models.CharField(max_length=64, blank=True, default="")
+    # Dimensions of the processed image.
+    width = models.IntegerField(blank=True, null=True)
+    height = models.IntegerField(blank=True, null=True)
+    # Last time the thumbnail was processed or served and times it was served, updated in bulk
+    # (see `access.py`).
+    accessed = models.DateTimeField(blank=True, null=True, db_index=True)
+    hits = models.PositiveBigIntegerField(default=0)
+
+    objects = ThumbnailQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Thumbnail"
         verbose_name_plural = "Thumbnails"
+        indexes = [
+            models.Index(
+                fields=["source_checksum", "max_width", "max_height", "format"],
+                name="thumbnails_source_idx",
+            )
+        ]
 
     def __str__(self):
         return self.url
+
+    def save(self, *args, **kwargs):
+        self.key = get_thumbnail_key(self.url, self.max_width, self.max_height, self.format)
+        return super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        key = self.key
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            if self.image:
+                ThumbnailBlob.objects.release((self.checksum, self.image.name))
+        transaction.on_commit(lambda: delete_index_entries(key))
+        return result
+
+    def set_blob(self, blob: ThumbnailBlob) -> None:
+        """
+        Point the thumbnail at a blob it holds a reference to, releasing its previous image.
+        """
+        previous = (self.checksum, self.image.name) if self.image else None
+        self.image = blob.image.name
+        self.checksum = blob.checksum
+        self.width = blob.width
+        self.height = blob.height
+        self.accessed = datetime.now(timezone.utc)
+        self.save()
+        if previous is not None:
+            ThumbnailBlob.objects.release(previous)
+        transaction.on_commit(lambda: self.index(size=blob.size))
+        transaction.on_commit(lambda: notify(DONE, self.key))
+
+    def index(self, size: int | None = None) -> None:
+        """
+        Index the storage name, size and validators of the processed image.
+        """
+        modified = self.modified or self.created
+        set_index_entry(
+            self.key,
+            {
+                "id": self.id,
+                "name": self.image.name,
+                "size": size,
+                "format": self.format,
+                "checksum": self.checksum,
+                "modified": modified.timestamp(),
+            },
+        )
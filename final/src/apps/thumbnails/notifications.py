@@ -0,0 +1,178 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+DONE = "done"
+FAILED = "failed"
+
+NOTIFY_CHANNEL = "thumbnails:done:{key}"
+STATUS_CACHE_KEY = "thumbnails:status:{key}"
+# Polling interval when the notification cache is not a Redis server (tests, local memory).
+FALLBACK_POLL_INTERVAL = 0.1
+
+
+def get_connection():
+    """
+    Get the Redis connection of the notification cache, `None` when it is not a django-redis
+    cache.
+    """
+    try:
+        return get_redis_connection(settings.THUMBNAILS_NOTIFY_CACHE)
+    except NotImplementedError:
+        return None
+
+
+def notify(status: str, *keys: str) -> None:
+    """
+    Tell the waiters of thumbnail keys that they are processed (`DONE`) or failed for good
+    (`FAILED`).
+
+    The status is stored before it is published, so waiters subscribing late still see it.
+    """
+    if not keys:
+        return
+    try:
+        caches[settings.THUMBNAILS_NOTIFY_CACHE].set_many(
+            {STATUS_CACHE_KEY.format(key=key): status for key in keys},
+            settings.THUMBNAILS_NOTIFY_TTL,
+        )
+        connection = get_connection()
+        if connection is not None:
+            pipeline = connection.pipeline(transaction=False)
+            for key in keys:
+                pipeline.publish(NOTIFY_CHANNEL.format(key=key), status)
+            pipeline.execute()
+    except Exception as e:
+        logger.warning(e)
+
+
+def reset(*keys: str) -> None:
+    """
+    Forget the statuses of thumbnail keys about to be processed again.
+    """
+    if not keys:
+        return
+    try:
+        caches[settings.THUMBNAILS_NOTIFY_CACHE].delete_many(
+            [STATUS_CACHE_KEY.format(key=key) for key in keys]
+        )
+    except Exception as e:
+        logger.warning(e)
+
+
+def get_statuses(keys) -> dict[str, str]:
+    try:
+        statuses = caches[settings.THUMBNAILS_NOTIFY_CACHE].get_many(
+            [STATUS_CACHE_KEY.format(key=key) for key in keys]
+        )
+    except Exception as e:
+        logger.warning(e)
+        return {}
+    prefix = STATUS_CACHE_KEY.format(key="")
+    return {cache_key[len(prefix) :]: status for cache_key, status in statuses.items()}
+
+
+class Subscription:
+    """
+    Completion notifications of a set of thumbnail keys.
+
+    Waiting wakes as soon as a key is notified over Redis pub/sub. The stored statuses are
+    checked on subscribing and every `THUMBNAILS_NOTIFY_POLL_INTERVAL` seconds, since pub/sub
+    messages are lost while nobody listens.
+    """
+
+    def __init__(self):
+        self.keys: set[str] = set()
+        self.statuses: dict[str, str] = {}
+        self.pubsub = None
+        try:
+            connection = get_connection()
+            if connection is not None:
+                self.pubsub = connection.pubsub(ignore_subscribe_messages=True)
+        except Exception as e:
+            logger.warning(e)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def add(self, *keys: str) -> None:
+        self.keys.update(keys)
+        if self.pubsub is not None:
+            try:
+                self.pubsub.subscribe(*(NOTIFY_CHANNEL.format(key=key) for key in keys))
+            except Exception as e:
+                logger.warning(e)
+                self.close()
+        self.statuses.update(get_statuses(keys))
+
+    def wait(self, timeout: float) -> dict[str, str]:
+        """
+        Wait up to `timeout` seconds for keys to complete. Returns the statuses of the completed
+        keys, which are no longer waited for; empty on timeout.
+        """
+        deadline = time.monotonic() + timeout
+        while not self.statuses and (remaining := deadline - time.monotonic()) > 0:
+            if self.pubsub is None:
+                time.sleep(min(remaining, FALLBACK_POLL_INTERVAL))
+            elif self.receive(min(remaining, settings.THUMBNAILS_NOTIFY_POLL_INTERVAL)):
+                continue
+            self.statuses.update(get_statuses(self.keys))
+
+        statuses, self.statuses = self.statuses, {}
+        self.discard(*statuses)
+        return statuses
+
+    def receive(self, timeout: float) -> bool:
+        """
+        Read a notification, returns whether there was one.
+        """
+        try:
+            message = self.pubsub.get_message(timeout=timeout)
+        except Exception as e:
+            logger.warning(e)
+            self.close()
+            return False
+        if message is None or message["type"] != "message":
+            return False
+        prefix = NOTIFY_CHANNEL.format(key="")
+        key = message["channel"].decode()[len(prefix) :]
+        if key in self.keys:
+            self.statuses[key] = message["data"].decode()
+        return True
+
+    def discard(self, *keys: str) -> None:
+        self.keys.difference_update(keys)
+        for key in keys:
+            self.statuses.pop(key, None)
+        if self.pubsub is not None and keys:
+            try:
+                self.pubsub.unsubscribe(*(NOTIFY_CHANNEL.format(key=key) for key in keys))
+            except Exception as e:
+                logger.warning(e)
+                self.close()
+
+    def close(self) -> None:
+        if self.pubsub is not None:
+            try:
+                self.pubsub.close()
+            except Exception as e:
+                logger.warning(e)
+            self.pubsub = None
+
+
+def wait_for(key: str, timeout: float) -> str | None:
+    """
+    Wait up to `timeout` seconds for a thumbnail key to complete. Returns its status, `None` on
+    timeout.
+    """
+    with Subscription() as subscription:
+        subscription.add(key)
+        return subscription.wait(timeout).get(key)
@@ -0,0 +1,134 @@
+import hashlib
+import re
+from typing import Callable
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from .models import Thumbnail
+
+RANGE_RE = re.compile(r"^bytes=(?P<start>\d*)-(?P<end>\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: str, length: int) -> tuple[int, int] | None:
+    """
+    Parse a single `Range: bytes=...` header into an inclusive `(start, end)` pair.
+
+    Returns `None` when the whole content should be served: no header, a malformed one or
+    multiple ranges, which the RFC allows to ignore.
+    """
+    match = RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+
+    start, end = match.group("start"), match.group("end")
+    if not start and not end:
+        return None
+    if not start:
+        # Suffix range: the last `end` bytes.
+        if int(end) == 0:
+            raise RangeNotSatisfiable()
+        return max(length - int(end), 0), length - 1
+    if int(start) >= length:
+        raise RangeNotSatisfiable()
+    if not end:
+        return int(start), length - 1
+    if int(end) < int(start):
+        return None
+    return int(start), min(int(end), length - 1)
+
+
+def if_range_passes(request, etag: str | None, last_modified: int | None) -> bool:
+    """
+    Check the `If-Range` precondition, a failed one means the whole content is served.
+    """
+    if_range = request.headers.get("If-Range")
+    if not if_range:
+        return True
+    if if_range.startswith(('"', "W/")):
+        return etag is not None and not if_range.startswith("W/") and if_range == etag
+    if_range_date = parse_http_date_safe(if_range)
+    return (
+        if_range_date is not None and last_modified is not None and last_modified <= if_range_date
+    )
+
+
+def get_validators(thumbnail: Thumbnail) -> tuple[str | None, int | None]:
+    """
+    Get the ETag and the Last-Modified timestamp of a thumbnail.
+    """
+    modified = thumbnail.modified or thumbnail.created
+    last_modified = int(modified.timestamp()) if modified else None
+    etag = quote_etag(thumbnail.checksum) if thumbnail.checksum else None
+    return etag, last_modified
+
+
+def patch_thumbnail_headers(
+    response: HttpResponse, etag: str | None, last_modified: int | None
+) -> HttpResponse:
+    """
+    Add the validators and the cache headers to a thumbnail response.
+    """
+    if etag is not None:
+        response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=settings.THUMBNAILS_CACHE_MAX_AGE)
+    return response
+
+
+def thumbnail_response(
+    request, thumbnail: Thumbnail, read: Callable[[], bytes], content_type: str
+) -> HttpResponse:
+    """
+    Build a thumbnail response with validators, cache headers and byte range support.
+
+    Conditional requests are answered before `read` is called, so a revalidation never touches
+    the storage.
+    """
+    etag, last_modified = get_validators(thumbnail)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        content = read()
+        if etag is None:
+            thumbnail.checksum = hashlib.sha256(content).hexdigest()
+            Thumbnail.objects.filter(id=thumbnail.id).update(checksum=thumbnail.checksum)
+            thumbnail.index(size=len(content))
+            etag = quote_etag(thumbnail.checksum)
+        response = ranged_response(request, content, content_type, etag, last_modified)
+
+    return patch_thumbnail_headers(response, etag, last_modified)
+
+
+def ranged_response(
+    request, content: bytes, content_type: str, etag: str | None, last_modified: int | None
+) -> HttpResponse:
+    """
+    Serve the requested byte range of the content, or the whole content.
+    """
+    length = len(content)
+    byte_range = None
+    if request.headers.get("Range") and if_range_passes(request, etag, last_modified):
+        try:
+            byte_range = parse_range(request.headers["Range"], length)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response.headers["Content-Range"] = f"bytes */{length}"
+            response.headers["Accept-Ranges"] = "bytes"
+            return response
+
+    if byte_range is None:
+        response = HttpResponse(content, content_type=content_type)
+    else:
+        start, end = byte_range
+        response = HttpResponse(content[start : end + 1], content_type=content_type, status=206)
+        response.headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+    response.headers["Accept-Ranges"] = "bytes"
+    return response
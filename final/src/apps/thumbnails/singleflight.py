@@ -0,0 +1,60 @@
+import logging
+from typing import Any, Callable, NamedTuple
+
+from celery import uuid
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.metrics.prometheus import resize_image_coalesced_count
+
+logger = logging.getLogger(__name__)
+
+FLIGHT_CACHE_KEY = "thumbnails:flight:{key}"
+
+
+class Flight(NamedTuple):
+    task_id: str
+    thumbnail_id: int
+    leader: bool
+
+
+def start_or_join(key: str, thumbnail_id: int, dispatch: Callable[[str], Any]) -> Flight:
+    """
+    Dispatch the task for a key once, later callers join the in-flight task.
+
+    The first caller takes a lease and calls `dispatch` with the task id to use. The lease
+    expires after `THUMBNAILS_FLIGHT_LEASE` seconds, so a crashed worker can not wedge the key.
+    """
+    cache_key = FLIGHT_CACHE_KEY.format(key=key)
+
+    while True:
+        task_id = uuid()
+        if cache.add(
+            cache_key,
+            {"task_id": task_id, "thumbnail_id": thumbnail_id},
+            settings.THUMBNAILS_FLIGHT_LEASE,
+        ):
+            try:
+                dispatch(task_id)
+            except Exception:
+                release(key, task_id)
+                raise
+            return Flight(task_id=task_id, thumbnail_id=thumbnail_id, leader=True)
+
+        flight = cache.get(cache_key)
+        if flight is not None:
+            resize_image_coalesced_count.inc()
+            return Flight(
+                task_id=flight["task_id"], thumbnail_id=flight["thumbnail_id"], leader=False
+            )
+        # The lease expired or was released in between, try to take it again.
+
+
+def release(key: str, task_id: str) -> None:
+    """
+    Release the lease of a key if it is still held by the given task.
+    """
+    cache_key = FLIGHT_CACHE_KEY.format(key=key)
+    flight = cache.get(cache_key)
+    if flight is not None and flight["task_id"] == task_id:
+        cache.delete(cache_key)
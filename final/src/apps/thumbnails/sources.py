@@ -0,0 +1,131 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple
+
+from django.conf import settings
+
+from apps.metrics.prometheus import thumbnail_source_cache_eviction_count
+
+logger = logging.getLogger(__name__)
+
+
+class CachedSource(NamedTuple):
+    content: bytes
+    etag: str | None
+    last_modified: str | None
+    # Seconds since the origin last confirmed the content.
+    age: float
+
+
+class SourceCache:
+    """
+    Disk cache of source images shared by the worker processes of a node.
+
+    Entries are keyed by normalized URL and keep the origin validators for revalidation. The
+    least recently used entries are evicted once the total size exceeds `max_bytes`.
+    """
+
+    def __init__(self, directory: str | Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def _paths(self, url: str) -> tuple[Path, Path]:
+        digest = hashlib.sha256(url.encode()).hexdigest()
+        return self.directory / f"{digest}.data", self.directory / f"{digest}.json"
+
+    def get(self, url: str) -> CachedSource | None:
+        data_path, meta_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text())
+            content = data_path.read_bytes()
+            os.utime(data_path)
+        except (OSError, ValueError):
+            return None
+        return CachedSource(
+            content=content,
+            etag=meta.get("etag"),
+            last_modified=meta.get("last_modified"),
+            age=time.time() - meta.get("validated", 0),
+        )
+
+    def size(self, url: str) -> int | None:
+        """
+        Get the size of a cached source without reading it, `None` when it is not cached.
+        """
+        data_path, _ = self._paths(url)
+        try:
+            return data_path.stat().st_size
+        except OSError:
+            return None
+
+    def set(
+        self, url: str, content: bytes, etag: str | None = None, last_modified: str | None = None
+    ) -> None:
+        if len(content) > self.max_bytes:
+            return
+        data_path, meta_path = self._paths(url)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._write(data_path, content)
+            self._write_meta(meta_path, etag, last_modified)
+            self._evict()
+        except OSError as e:
+            logger.warning(e)
+
+    def revalidated(self, url: str, cached: CachedSource) -> None:
+        """
+        Record that the origin confirmed a cached entry.
+        """
+        _, meta_path = self._paths(url)
+        try:
+            self._write_meta(meta_path, cached.etag, cached.last_modified)
+        except OSError as e:
+            logger.warning(e)
+
+    def _write_meta(self, path: Path, etag: str | None, last_modified: str | None) -> None:
+        meta = {"etag": etag, "last_modified": last_modified, "validated": time.time()}
+        self._write(path, json.dumps(meta).encode())
+
+    def _write(self, path: Path, content: bytes) -> None:
+        # Write to a temporary file first so other processes never read a partial entry.
+        fd, temp_path = tempfile.mkstemp(dir=self.directory)
+        with os.fdopen(fd, "wb") as file:
+            file.write(content)
+        os.replace(temp_path, path)
+
+    def _evict(self) -> None:
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".data"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, Path(entry.path)))
+                total += stat.st_size
+
+        entries.sort()
+        for _, size, data_path in entries:
+            if total <= self.max_bytes:
+                break
+            data_path.unlink(missing_ok=True)
+            data_path.with_suffix(".json").unlink(missing_ok=True)
+            total -= size
+            thumbnail_source_cache_eviction_count.inc()
+
+
+@lru_cache(maxsize=None)
+def get_source_cache() -> SourceCache | None:
+    """
+    Get the source cache, `None` when it is disabled.
+    """
+    if not settings.THUMBNAILS_SOURCE_CACHE_MAX_BYTES:
+        return None
+    return SourceCache(
+        settings.THUMBNAILS_SOURCE_CACHE_DIR or Path(tempfile.gettempdir()) / "thumbnail-sources",
+        settings.THUMBNAILS_SOURCE_CACHE_MAX_BYTES,
+    )
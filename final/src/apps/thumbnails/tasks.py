@@ -1,44 +1,382 @@
+import hashlib
 import logging
+import time
+from datetime import datetime, timedelta, timezone
 from io import BytesIO
+from math import ceil
+from typing import NamedTuple
 
-from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from PIL import Image
+from PIL.Image import Image as PILImage
 
+from apps.metrics.prometheus import (
+    get_size_bucket,
+    thumbnail_duplicate_count,
+    thumbnail_eviction_count,
+    thumbnail_hits_flush_lag,
+    thumbnail_hits_flush_rows,
+    thumbnail_stage_time,
+    thumbnail_storage_bytes,
+)
+from apps.metrics.signals.handlers import PUBLISHED_AT_HEADER
 from common.celery import app
 
-from .models import Thumbnail
-from .utils import get_pil_image_from_url
+from .access import ack_accesses, take_accesses
+from .derivation import fetch_thumbnail_source
+from .encoding import DEFAULT_FORMAT, encode_image
+from .exceptions import SourceError, SourceNotImage, SourceTooLarge
+from .failures import remember_failure
+from .models import Thumbnail, ThumbnailBlob, get_thumbnail_key
+from .notifications import FAILED, notify
+from .utils import fetch_source
+from .workers import run_cpu
 
 logger = logging.getLogger(__name__)
 
 
+def get_scale(image: PILImage, size: tuple[int, int]) -> float:
+    """
+    Get the scale `Image.thumbnail` applies to fit an image into a box.
+    """
+    max_width, max_height = size
+    return min(max_width / image.width, max_height / image.height, 1)
+
+
+def shrink_on_load(image: PILImage, size: tuple[int, int]) -> PILImage:
+    """
+    Decode an image at the smallest size that still has enough pixels for a box.
+
+    JPEG sources are decoded at a reduced scale (DCT scaling in draft mode), other formats are
+    reduced by an integer factor right after decoding. `THUMBNAILS_REDUCING_GAP` is how many
+    times the target size is kept for the final resampling: higher is closer to a full decode,
+    lower is faster. 0 disables it.
+    """
+    reducing_gap = settings.THUMBNAILS_REDUCING_GAP
+    scale = get_scale(image, size)
+    if not reducing_gap or scale * reducing_gap >= 1 or image.mode in ("1", "P"):
+        return image
+
+    if image.format == "JPEG":
+        image.draft(
+            None,
+            (ceil(image.width * scale * reducing_gap), ceil(image.height * scale * reducing_gap)),
+        )
+        image.load()
+        return image
+
+    factor = int(1 / (scale * reducing_gap))
+    return image.reduce(factor) if factor > 1 else image
+
+
+def render_thumbnail(image: PILImage, size: tuple[int, int]) -> PILImage:
+    """
+    Resize a copy of an image to fit into a box.
+    """
+    thumbnail = image.copy()
+    thumbnail.thumbnail(
+        size,
+        resample=Image.Resampling[settings.THUMBNAILS_RESAMPLE],
+        reducing_gap=settings.THUMBNAILS_REDUCING_GAP or None,
+    )
+    return thumbnail
+
+
+class Rendering(NamedTuple):
+    # Encoded image of each box.
+    contents: dict[tuple[int, int], bytes]
+    # Seconds spent per stage (decode, resize, encode) and box, observed by the caller since
+    # the rendering may run in a child process.
+    timings: list[tuple[str, tuple[int, int], float]]
+
+
+def render_thumbnails(content: bytes, sizes: list[tuple[int, int]], format: str) -> Rendering:
+    """
+    Decode a source image, resize it to fit each box and encode the results (the CPU stage).
+
+    The source is decoded once, each size is then resized from the previous (larger) one.
+    Sources Pillow can not decode raise `SourceError`. Resize and encode errors are left as they
+    are: they depend on the output format, not only on the source.
+    """
+    rendering = Rendering({}, [])
+    started = time.perf_counter()
+    try:
+        image = Image.open(BytesIO(content))
+
+        # A thumbnail can be resized from another one if it is scaled down at least as much.
+        targets = sorted(set(sizes), key=lambda size: get_scale(image, size), reverse=True)
+        image = shrink_on_load(image, targets[0])
+        image.load()
+    except Image.DecompressionBombError as e:
+        raise SourceTooLarge(str(e))
+    except (OSError, ValueError) as e:
+        raise SourceNotImage(str(e))
+    rendering.timings.append(("decode", targets[0], time.perf_counter() - started))
+
+    for size in targets:
+        started = time.perf_counter()
+        image = render_thumbnail(image, size)
+        resized = time.perf_counter()
+        rendering.contents[size] = encode_image(image, format)
+        rendering.timings.append(("resize", size, resized - started))
+        rendering.timings.append(("encode", size, time.perf_counter() - resized))
+    return rendering
+
+
+def observe_stage(stage: str, size: tuple[int, int], seconds: float) -> None:
+    thumbnail_stage_time.labels(stage=stage, size=get_size_bucket(*size)).observe(seconds)
+
+
+def observe_queue_wait(task, size: tuple[int, int]) -> None:
+    """
+    Observe how long a task waited in its queue (see `apps.metrics.signals.handlers`).
+    """
+    published_at = getattr(task.request, PUBLISHED_AT_HEADER, None)
+    if published_at is not None:
+        observe_stage("queue_wait", size, max(time.time() - published_at, 0))
+
+
+def save_thumbnail_image(thumbnail: Thumbnail, content: bytes) -> None:
+    """
+    Store the encoded image of a thumbnail, shared with the thumbnails with the same bytes.
+    """
+    started = time.perf_counter()
+    with transaction.atomic():
+        thumbnail.set_blob(ThumbnailBlob.objects.store(content, thumbnail.format))
+    observe_stage(
+        "upload", (thumbnail.max_width, thumbnail.max_height), time.perf_counter() - started
+    )
+
+
+def save_processed_duplicate(thumbnail: Thumbnail) -> bool:
+    """
+    Point a thumbnail at the image already processed from the same source bytes, size and
+    format, if any. Returns whether there was one.
+    """
+    if not thumbnail.source_checksum:
+        return False
+
+    checksum = (
+        Thumbnail.objects.filter(
+            source_checksum=thumbnail.source_checksum,
+            max_width=thumbnail.max_width,
+            max_height=thumbnail.max_height,
+            format=thumbnail.format,
+        )
+        .exclude(id=thumbnail.id)
+        .exclude(image="")
+        .values_list("checksum", flat=True)
+        .first()
+    )
+    if not checksum:
+        return False
+
+    with transaction.atomic():
+        blob = ThumbnailBlob.objects.acquire(checksum)
+        if blob is None:
+            return False
+        thumbnail.set_blob(blob)
+    thumbnail_duplicate_count.inc()
+    return True
+
+
+def notify_failure(task, error: Exception, url: str, *keys: str) -> None:
+    """
+    Tell the waiters of thumbnails that their task failed: at once for a bad source, which is
+    remembered in the failure cache, else once the task has no retries left.
+
+    Successes are notified when the images are saved (`Thumbnail.set_blob`).
+    """
+    if isinstance(error, SourceError):
+        remember_failure(url, error)
+        notify(FAILED, *keys)
+    elif task.request.retries >= task.max_retries:
+        notify(FAILED, *keys)
+
+
 @app.task(
     bind=True,
     max_retries=3,
     autoretry_for=(Exception,),
+    dont_autoretry_for=(SourceError,),
     retry_backoff=True,
     retry_backoff_max=8,
     retry_jitter=False,
 )
 def process_thumbnail(self, thumbnail_id: int) -> None:
     """
-    Process a thumbnail.
+    Process a thumbnail, from a larger thumbnail of the same image when there is one.
     """
     thumbnail = Thumbnail.objects.get(id=thumbnail_id)
+    observe_queue_wait(self, (thumbnail.max_width, thumbnail.max_height))
+    try:
+        make_thumbnail(thumbnail)
+    except Exception as e:
+        notify_failure(self, e, thumbnail.url, thumbnail.key)
+        raise
 
-    image = get_pil_image_from_url(thumbnail.url)
-    image.thumbnail((thumbnail.max_width, thumbnail.max_height))
-    image_io = BytesIO()
-    image.save(image_io, format="JPEG")
-    thumbnail.image.save(
-        f"{thumbnail_id}.jpeg",
-        InMemoryUploadedFile(
-            image_io,
-            None,
-            f"{thumbnail_id}.jpeg",
-            "image/jpeg",
-            image_io.tell,
-            None,
-        ),
-        save=False,
+
+def make_thumbnail(thumbnail: Thumbnail) -> None:
+    """
+    Resize and save the image of a thumbnail, skipping the rendering of a duplicate source.
+    """
+    size = (thumbnail.max_width, thumbnail.max_height)
+    started = time.perf_counter()
+    source = fetch_thumbnail_source(thumbnail)
+    observe_stage("fetch", size, time.perf_counter() - started)
+    thumbnail.source_checksum = source.checksum
+    if save_processed_duplicate(thumbnail):
+        return
+
+    rendering = run_cpu(render_thumbnails, source.content, [size], thumbnail.format)
+    for timing in rendering.timings:
+        observe_stage(*timing)
+    save_thumbnail_image(thumbnail, rendering.contents[size])
+
+
+@app.task(
+    bind=True,
+    max_retries=3,
+    autoretry_for=(Exception,),
+    dont_autoretry_for=(SourceError,),
+    retry_backoff=True,
+    retry_backoff_max=8,
+    retry_jitter=False,
+)
+def process_thumbnails(
+    self, url: str, sizes: list[list[int]], format: str = DEFAULT_FORMAT
+) -> list[int]:
+    """
+    Process thumbnails of several sizes of one image.
+
+    The source is fetched and decoded once, sizes already processed from the same source bytes
+    are not processed again. Returns the thumbnail ids.
+    """
+    observe_queue_wait(self, max(sizes, key=max))
+    try:
+        return _process_thumbnails(url, sizes, format)
+    except Exception as e:
+        notify_failure(
+            self,
+            e,
+            url,
+            *(
+                get_thumbnail_key(url, max_width, max_height, format)
+                for max_width, max_height in sizes
+            ),
+        )
+        raise
+
+
+def _process_thumbnails(url: str, sizes: list[list[int]], format: str) -> list[int]:
+    started = time.perf_counter()
+    content = fetch_source(url)
+    observe_stage("fetch", max(sizes, key=max), time.perf_counter() - started)
+    source_checksum = hashlib.sha256(content).hexdigest()
+
+    thumbnails = []
+    pending = []
+    for max_width, max_height in dict.fromkeys(tuple(size) for size in sizes):
+        thumbnail = Thumbnail.objects.get_or_insert(url, max_width, max_height, format)
+        thumbnail.source_checksum = source_checksum
+        thumbnails.append(thumbnail)
+        if not save_processed_duplicate(thumbnail):
+            pending.append(thumbnail)
+
+    if pending:
+        rendering = run_cpu(
+            render_thumbnails,
+            content,
+            [(thumbnail.max_width, thumbnail.max_height) for thumbnail in pending],
+            format,
+        )
+        for timing in rendering.timings:
+            observe_stage(*timing)
+        with transaction.atomic():
+            for thumbnail in pending:
+                save_thumbnail_image(
+                    thumbnail, rendering.contents[(thumbnail.max_width, thumbnail.max_height)]
+                )
+    return [thumbnail.id for thumbnail in thumbnails]
+
+
+@app.task
+def flush_thumbnail_accesses() -> int:
+    """
+    Add the recorded hits and last access times of thumbnails to the database, in bulk.
+
+    The accesses are only dropped from Redis once the update is committed, a failed flush leaves
+    them for the next one.
+
+    Returns the number of updated thumbnails.
+    """
+    accesses = take_accesses()
+    if accesses.since is not None:
+        thumbnail_hits_flush_lag.set(time.time() - accesses.since)
+    with transaction.atomic():
+        Thumbnail.objects.bulk_update(
+            [
+                Thumbnail(
+                    id=thumbnail_id,
+                    accessed=datetime.fromtimestamp(accessed, tz=timezone.utc),
+                    hits=F("hits") + hits,
+                )
+                for thumbnail_id, (accessed, hits) in accesses.thumbnails.items()
+            ],
+            ["accessed", "hits"],
+            batch_size=settings.THUMBNAILS_ACCESS_FLUSH_BATCH_SIZE,
+        )
+        transaction.on_commit(ack_accesses)
+    thumbnail_hits_flush_rows.observe(len(accesses.thumbnails))
+    return len(accesses.thumbnails)
+
+
+def get_storage_bytes() -> int:
+    return ThumbnailBlob.objects.aggregate(size=Sum("size"))["size"] or 0
+
+
+def evict_batch(thumbnails) -> int:
+    """
+    Delete the first batch of thumbnails with their unused blobs. Returns how many were deleted.
+    """
+    thumbnail_ids = list(
+        thumbnails.values_list("id", flat=True)[: settings.THUMBNAILS_EVICTION_BATCH_SIZE]
     )
-    thumbnail.save()
+    if thumbnail_ids:
+        Thumbnail.objects.filter(id__in=thumbnail_ids).delete()
+    return len(thumbnail_ids)
+
+
+@app.task
+def evict_thumbnails() -> int:
+    """
+    Evict processed thumbnails: the ones not accessed for `THUMBNAILS_MAX_IDLE` seconds, then the
+    least recently accessed ones until the stored blobs fit in `THUMBNAILS_STORAGE_MAX_BYTES`.
+
+    Returns the number of evicted thumbnails.
+    """
+    flush_thumbnail_accesses()
+    processed = Thumbnail.objects.exclude(image="")
+    evicted = 0
+
+    if settings.THUMBNAILS_MAX_IDLE:
+        threshold = datetime.now(timezone.utc) - timedelta(seconds=settings.THUMBNAILS_MAX_IDLE)
+        expired = processed.filter(
+            Q(accessed__lt=threshold) | Q(accessed__isnull=True, created__lt=threshold)
+        )
+        while count := evict_batch(expired):
+            evicted += count
+
+    if settings.THUMBNAILS_STORAGE_MAX_BYTES:
+        # Thumbnails not accessed since access tracking started go first.
+        least_recently_used = processed.order_by(F("accessed").asc(nulls_first=True), "id")
+        while get_storage_bytes() > settings.THUMBNAILS_STORAGE_MAX_BYTES and (
+            count := evict_batch(least_recently_used)
+        ):
+            evicted += count
+
+    thumbnail_eviction_count.inc(evicted)
+    thumbnail_storage_bytes.set(get_storage_bytes())
+    return evicted
@@ -0,0 +1,92 @@
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from ..models import Thumbnail
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class BatchTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        thumbnail = Thumbnail.objects.create(
+            url="https://picsum.photos/1000", max_height=100, max_width=100
+        )
+        thumbnail.image.save("batch.jpeg", ContentFile(b"jpeg"))
+
+    @mock.patch("apps.thumbnails.api.views.batch.group")
+    def test_batch(self, group):
+        data = {
+            "items": [
+                {
+                    "url": "https://picsum.photos/1000",
+                    "sizes": [
+                        {"max_width": 100, "max_height": 100},
+                        {"max_width": 200, "max_height": 200},
+                    ],
+                },
+                {
+                    "url": "https://picsum.photos/2000",
+                    "sizes": [{"max_width": 100, "max_height": 100}],
+                },
+            ]
+        }
+
+        # Ready thumbnails, then the pending ones inserted in bulk.
+        with self.assertNumQueries(4):
+            response = self.client.post("/api/v1/thumbnails/batch/", data, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        items = response.data["data"]["items"]
+        self.assertEqual(
+            [[size["status"] for size in item["sizes"]] for item in items],
+            [["ready", "pending"], ["pending"]],
+        )
+        self.assertTrue(
+            items[0]["sizes"][0]["thumbnail"].endswith(
+                "/api/v1/thumbnails/100x100/https://picsum.photos/1000/"
+            )
+        )
+        signatures = list(group.call_args.args[0])
+        self.assertEqual(
+            [signature.args for signature in signatures],
+            [
+                ("https://picsum.photos/1000", [[200, 200]], "jpeg"),
+                ("https://picsum.photos/2000", [[100, 100]], "jpeg"),
+            ],
+        )
+
+    @mock.patch("apps.thumbnails.api.views.resize.process_thumbnail.apply_async")
+    @mock.patch("apps.thumbnails.api.views.batch.group")
+    def test_batch_pending_joined(self, group, apply_async):
+        data = {
+            "items": [
+                {
+                    "url": "https://picsum.photos/2000",
+                    "sizes": [{"max_width": 100, "max_height": 100}],
+                }
+            ]
+        }
+        self.client.post("/api/v1/thumbnails/batch/", data, format="json")
+        self.client.post("/api/v1/thumbnails/batch/", data, format="json")
+
+        response = self.client.get(
+            "/api/v1/thumbnails/100x100/https://picsum.photos/2000/", HTTP_PREFER="respond-async"
+        )
+
+        self.assertEqual(response.status_code, 202)
+        group.assert_called_once()
+        apply_async.assert_not_called()
+        self.assertEqual(Thumbnail.objects.filter(url="https://picsum.photos/2000").count(), 1)
+
+    def test_batch_invalid(self):
+        response = self.client.post(
+            "/api/v1/thumbnails/batch/", {"items": [{"url": "picsum", "sizes": []}]}, format="json"
+        )
+
+        self.assertEqual(response.status_code, 400)
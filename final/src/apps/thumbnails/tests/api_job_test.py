@@ -0,0 +1,83 @@
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from ..jobs import register_job
+from ..models import Thumbnail
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class JobTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = "/api/v1/thumbnails/100x100/https://picsum.photos/1000/"
+
+    @mock.patch("apps.thumbnails.api.views.resize.process_thumbnail.apply_async")
+    def test_resize_prefer_respond_async(self, apply_async):
+        response = self.client.get(self.url, HTTP_PREFER="respond-async")
+
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data["data"]["job_id"]
+        self.assertEqual(apply_async.call_args.kwargs["task_id"], job_id)
+        self.assertTrue(response["Location"].endswith(f"/api/v1/thumbnails/jobs/{job_id}/"))
+        self.assertEqual(response["Retry-After"], "1")
+
+    @mock.patch("apps.thumbnails.api.views.resize.process_thumbnail.apply_async")
+    def test_resize_async_json_content_type(self, apply_async):
+        response = self.client.get(self.url, HTTP_PREFER="respond-async", HTTP_ACCEPT="image/webp")
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response["Content-Type"], "application/json")
+
+    @override_settings(THUMBNAILS_RESIZE_ASYNC=True)
+    @mock.patch("apps.thumbnails.api.views.resize.process_thumbnail.apply_async")
+    def test_resize_async_setting(self, apply_async):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 202)
+
+    @mock.patch("apps.thumbnails.api.views.resize.wait_for", return_value=None)
+    @mock.patch("apps.thumbnails.api.views.resize.process_thumbnail.apply_async")
+    def test_resize_wait_timeout(self, apply_async, wait_for):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data["data"]["job_id"]
+        self.assertTrue(response["Location"].endswith(f"/api/v1/thumbnails/jobs/{job_id}/"))
+        self.assertTrue(Thumbnail.objects.exists())
+
+        # The lease is kept: a second request joins the running task.
+        self.client.get(self.url)
+        apply_async.assert_called_once()
+
+    def test_job_pending(self):
+        thumbnail = Thumbnail.objects.create(
+            url="https://picsum.photos/1000", max_height=100, max_width=100
+        )
+        register_job("job-3", thumbnail.id)
+
+        response = self.client.get("/api/v1/thumbnails/jobs/job-3/")
+
+        self.assertEqual(response.status_code, 202)
+
+    def test_job_done(self):
+        thumbnail = Thumbnail.objects.create(
+            url="https://picsum.photos/1000", max_height=100, max_width=100
+        )
+        thumbnail.image.save("job.jpeg", ContentFile(b"jpeg"))
+        register_job("job-4", thumbnail.id)
+
+        response = self.client.get("/api/v1/thumbnails/jobs/job-4/")
+
+        self.assertEqual(response.status_code, 303)
+        self.assertTrue(response["Location"].endswith(self.url))
+
+    def test_job_unknown(self):
+        response = self.client.get("/api/v1/thumbnails/jobs/unknown/")
+
+        self.assertEqual(response.status_code, 404)
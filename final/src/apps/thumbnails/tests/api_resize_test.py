@@ -1,6 +1,12 @@
-from django.test import TestCase
+import tempfile
 
-from ..models import Thumbnail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from ..index import INDEX_CACHE_KEY
+from ..models import Thumbnail, get_thumbnail_key
 from ..tasks import process_thumbnail
 
 
@@ -28,3 +34,55 @@ class AnimalTestCase(TestCase):
     def test_process_thumbnail_bad(self):
         with self.assertRaises(Exception):
             process_thumbnail(self.thumbnail_bad.id)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ResizeTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = "/api/v1/thumbnails/100x100/https://picsum.photos/1000/"
+        for format in ("jpeg", "webp"):
+            thumbnail = Thumbnail.objects.create(
+                url="https://picsum.photos/1000", max_height=100, max_width=100, format=format
+            )
+            thumbnail.image.save(f"resize.{format}", ContentFile(format.encode()))
+
+    def test_resize_negotiates_format(self):
+        response = self.client.get(self.url, HTTP_ACCEPT="image/webp,image/*")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/webp")
+        self.assertEqual(response.content, b"webp")
+        self.assertIn("Accept", response["Vary"])
+
+    def test_resize_default_format(self):
+        response = self.client.get(self.url, HTTP_ACCEPT="image/*")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertEqual(response.content, b"jpeg")
+
+    def test_resize_index_hit_skips_database(self):
+        self.client.get(self.url, HTTP_ACCEPT="image/*")
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_ACCEPT="image/*")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"jpeg")
+        self.assertIn("ETag", response)
+
+    def test_resize_stale_index_entry(self):
+        self.client.get(self.url, HTTP_ACCEPT="image/*")
+        cache_key = INDEX_CACHE_KEY.format(
+            key=get_thumbnail_key("https://picsum.photos/1000", 100, 100, "jpeg")
+        )
+        entry = cache.get(cache_key)
+        cache.set(cache_key, {**entry, "name": "thumbnails/deleted.jpeg"})
+
+        response = self.client.get(self.url, HTTP_ACCEPT="image/*")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"jpeg")
+        self.assertEqual(cache.get(cache_key)["name"], entry["name"])
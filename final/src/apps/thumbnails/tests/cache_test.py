@@ -0,0 +1,75 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from prometheus_client import REGISTRY
+
+from ..cache import LRUByteCache, ThumbnailByteCache
+
+
+class LRUByteCacheTestCase(SimpleTestCase):
+    def test_evicts_least_recently_used(self):
+        lru = LRUByteCache(max_bytes=10)
+        lru.set("a", b"aaaa")
+        lru.set("b", b"bbbb")
+        lru.get("a")
+        lru.set("c", b"cccc")
+
+        self.assertEqual(lru.get("a"), b"aaaa")
+        self.assertIsNone(lru.get("b"))
+        self.assertEqual(lru.get("c"), b"cccc")
+        self.assertEqual(lru.size, 8)
+
+    def test_skips_values_over_capacity(self):
+        lru = LRUByteCache(max_bytes=2)
+        lru.set("a", b"aaaa")
+
+        self.assertEqual(len(lru), 0)
+        self.assertEqual(lru.size, 0)
+
+
+class ThumbnailByteCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_read_through(self):
+        byte_cache = ThumbnailByteCache(LRUByteCache(1024), "default", 60, 1024)
+        loader = mock.Mock(return_value=b"jpeg")
+
+        self.assertEqual(byte_cache.get("thumbnails/1.jpeg", loader), b"jpeg")
+        self.assertEqual(byte_cache.get("thumbnails/1.jpeg", loader), b"jpeg")
+        loader.assert_called_once()
+
+    def test_shared_tier(self):
+        loader = mock.Mock(return_value=b"jpeg")
+        ThumbnailByteCache(LRUByteCache(1024), "default", 60, 1024).get("thumbnails/1.jpeg", loader)
+
+        other_process = ThumbnailByteCache(LRUByteCache(1024), "default", 60, 1024)
+
+        self.assertEqual(other_process.get("thumbnails/1.jpeg", loader), b"jpeg")
+        loader.assert_called_once()
+
+    def test_shared_tier_entry_cap(self):
+        loader = mock.Mock(return_value=b"jpeg")
+        ThumbnailByteCache(LRUByteCache(1024), "default", 60, 2).get("thumbnails/1.jpeg", loader)
+        ThumbnailByteCache(LRUByteCache(1024), "default", 60, 2).get("thumbnails/1.jpeg", loader)
+
+        self.assertEqual(loader.call_count, 2)
+
+    def test_invalidate(self):
+        loader = mock.Mock(return_value=b"jpeg")
+        byte_cache = ThumbnailByteCache(LRUByteCache(1024), "default", 60, 1024)
+        byte_cache.get("thumbnails/1.jpeg", loader)
+        evictions = REGISTRY.get_sample_value(
+            "thumbnail_cache_eviction_count_total", {"tier": "shared"}
+        )
+
+        byte_cache.invalidate("thumbnails/1.jpeg")
+        byte_cache.invalidate("thumbnails/1.jpeg")
+
+        self.assertEqual(byte_cache.get("thumbnails/1.jpeg", loader), b"jpeg")
+        self.assertEqual(loader.call_count, 2)
+        self.assertEqual(
+            REGISTRY.get_sample_value("thumbnail_cache_eviction_count_total", {"tier": "shared"}),
+            evictions + 1,
+        )
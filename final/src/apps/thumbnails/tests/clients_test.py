@@ -0,0 +1,47 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apps.metrics.prometheus import thumbnail_origin_connection_count
+
+from ..clients import get_session, origin_get
+
+
+class OriginHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "5")
+        self.end_headers()
+        self.wfile.write(b"image")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ClientsTestCase(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), OriginHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/image.png"
+
+    def test_keep_alive(self):
+        connections = thumbnail_origin_connection_count._value.get()
+
+        for _ in range(3):
+            self.assertEqual(origin_get(self.url).content, b"image")
+
+        self.assertEqual(thumbnail_origin_connection_count._value.get() - connections, 1)
+
+    def test_session_per_process(self):
+        session = get_session()
+        self.assertIs(get_session(), session)
+
+        with mock.patch("apps.thumbnails.clients.os.getpid", return_value=os.getpid() + 1):
+            self.assertIsNot(get_session(), session)
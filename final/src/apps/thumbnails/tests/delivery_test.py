@@ -0,0 +1,51 @@
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import RequestFactory, TestCase, override_settings
+
+from ..delivery import get_delivery
+from ..models import Thumbnail
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class DeliveryTestCase(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.thumbnail = Thumbnail.objects.create(
+            url="https://picsum.photos/1000", max_height=100, max_width=100, checksum="abc"
+        )
+        self.thumbnail.image.save("delivery.jpeg", ContentFile(b"jpeg"))
+
+    @override_settings(THUMBNAILS_DELIVERY_MODE="proxy")
+    def test_proxy(self):
+        response = get_delivery().respond(self.factory.get("/"), self.thumbnail)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"jpeg")
+
+    @override_settings(THUMBNAILS_DELIVERY_MODE="x-accel")
+    def test_x_accel(self):
+        response = get_delivery().respond(self.factory.get("/"), self.thumbnail)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(
+            response["X-Accel-Redirect"], f"/protected-media/{self.thumbnail.image.name}"
+        )
+        self.assertEqual(response["ETag"], '"abc"')
+
+    @override_settings(THUMBNAILS_DELIVERY_MODE="x-accel")
+    def test_x_accel_not_modified(self):
+        response = get_delivery().respond(
+            self.factory.get("/", HTTP_IF_NONE_MATCH='"abc"'), self.thumbnail
+        )
+
+        self.assertEqual(response.status_code, 304)
+        self.assertNotIn("X-Accel-Redirect", response)
+
+    @override_settings(THUMBNAILS_DELIVERY_MODE="redirect")
+    def test_redirect(self):
+        response = get_delivery().respond(self.factory.get("/"), self.thumbnail)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response["Location"], self.thumbnail.image.url)
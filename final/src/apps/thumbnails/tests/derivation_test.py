@@ -0,0 +1,55 @@
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from ..derivation import plan_derivation
+from ..models import Thumbnail
+from ..tasks import process_thumbnail, save_thumbnail_image
+
+
+def encode(size: tuple[int, int]) -> bytes:
+    image_io = BytesIO()
+    Image.new("RGB", size).save(image_io, format="JPEG")
+    return image_io.getvalue()
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), THUMBNAILS_DERIVE_MIN_RATIO=2.0)
+class DerivationTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.url = "https://picsum.photos/1000"
+        for max_size, size in ((800, (800, 400)), (400, (400, 200))):
+            save_thumbnail_image(
+                Thumbnail.objects.create(url=self.url, max_width=max_size, max_height=max_size),
+                encode(size),
+            )
+
+    def plan(self, max_width: int, max_height: int) -> Thumbnail | None:
+        return plan_derivation(
+            Thumbnail.objects.create(url=self.url, max_width=max_width, max_height=max_height)
+        )
+
+    def test_smallest_large_enough(self):
+        self.assertEqual(self.plan(200, 200).width, 400)
+        self.assertEqual(self.plan(300, 300).width, 800)
+
+    def test_too_small(self):
+        self.assertIsNone(self.plan(500, 500))
+
+    @override_settings(THUMBNAILS_DERIVE_MIN_RATIO=0)
+    def test_disabled(self):
+        self.assertIsNone(self.plan(100, 100))
+
+    @mock.patch("apps.thumbnails.derivation.fetch_source")
+    def test_process_thumbnail_from_derivative(self, fetch_source):
+        thumbnail = Thumbnail.objects.create(url=self.url, max_width=100, max_height=100)
+
+        process_thumbnail(thumbnail.id)
+
+        fetch_source.assert_not_called()
+        thumbnail.refresh_from_db()
+        self.assertEqual((thumbnail.width, thumbnail.height), (100, 50))
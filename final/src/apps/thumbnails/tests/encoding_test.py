@@ -0,0 +1,35 @@
+from io import BytesIO
+
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from ..encoding import encode_image, negotiate_format
+
+
+class EncodingTestCase(SimpleTestCase):
+    def test_negotiate_format(self):
+        self.assertEqual(negotiate_format("image/avif,image/webp,*/*;q=0.8"), "avif")
+        self.assertEqual(negotiate_format("image/avif;q=0,image/webp"), "webp")
+        self.assertEqual(negotiate_format("image/*,*/*"), "jpeg")
+        self.assertEqual(negotiate_format(""), "jpeg")
+
+    @override_settings(THUMBNAILS_FORMATS=["webp"])
+    def test_negotiate_format_preference(self):
+        self.assertEqual(negotiate_format("image/avif,image/webp"), "webp")
+
+    def test_encode_image(self):
+        image = Image.new("RGBA", (10, 10))
+
+        jpeg = Image.open(BytesIO(encode_image(image, "jpeg")))
+        webp = Image.open(BytesIO(encode_image(image, "webp")))
+
+        self.assertEqual((jpeg.format, jpeg.mode), ("JPEG", "RGB"))
+        self.assertEqual((webp.format, webp.mode), ("WEBP", "RGBA"))
+
+    def test_encode_image_strip_metadata(self):
+        exif = Image.Exif()
+        exif[0x010E] = "description"
+        image = Image.new("RGB", (10, 10))
+        image.info["exif"] = exif.tobytes()
+
+        self.assertNotIn("exif", Image.open(BytesIO(encode_image(image, "jpeg"))).info)
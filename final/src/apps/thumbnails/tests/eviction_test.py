@@ -0,0 +1,120 @@
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from ..access import ACCESS_KEY, HITS_KEY, SINCE_KEY, Accesses, record_access, take_accesses
+from ..models import Thumbnail, ThumbnailBlob
+from ..tasks import evict_thumbnails, flush_thumbnail_accesses, save_thumbnail_image
+
+
+@override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(), THUMBNAILS_MAX_IDLE=0, THUMBNAILS_STORAGE_MAX_BYTES=0
+)
+@mock.patch("apps.thumbnails.tasks.ack_accesses")
+@mock.patch("apps.thumbnails.tasks.take_accesses", return_value=Accesses({}, None))
+class EvictThumbnailsTestCase(TestCase):
+    def setUp(self):
+        now = datetime.now(timezone.utc)
+        self.thumbnails = []
+        for days, color in ((3, "red"), (2, "green"), (1, "blue")):
+            image_io = BytesIO()
+            Image.new("RGB", (100, 50), color).save(image_io, format="PNG")
+            thumbnail = Thumbnail.objects.create(
+                url=f"https://picsum.photos/{color}", max_height=100, max_width=100
+            )
+            save_thumbnail_image(thumbnail, image_io.getvalue())
+            Thumbnail.objects.filter(id=thumbnail.id).update(accessed=now - timedelta(days=days))
+            self.thumbnails.append(thumbnail)
+
+    def remaining(self) -> list[str]:
+        return list(Thumbnail.objects.order_by("id").values_list("url", flat=True))
+
+    def test_storage_budget(self, take_accesses, ack_accesses):
+        budget = sum(ThumbnailBlob.objects.values_list("size", flat=True)) - 1
+        storage = self.thumbnails[0].image.storage
+
+        with override_settings(
+            THUMBNAILS_STORAGE_MAX_BYTES=budget, THUMBNAILS_EVICTION_BATCH_SIZE=1
+        ), self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(evict_thumbnails(), 1)
+
+        self.assertEqual(
+            self.remaining(), ["https://picsum.photos/green", "https://picsum.photos/blue"]
+        )
+        self.assertEqual(ThumbnailBlob.objects.count(), 2)
+        self.assertFalse(storage.exists(self.thumbnails[0].image.name))
+
+    @override_settings(THUMBNAILS_MAX_IDLE=36 * 60 * 60)
+    def test_max_idle(self, take_accesses, ack_accesses):
+        self.assertEqual(evict_thumbnails(), 2)
+
+        self.assertEqual(self.remaining(), ["https://picsum.photos/blue"])
+
+    def test_flush_accesses(self, take_accesses, ack_accesses):
+        accessed = datetime.now(timezone.utc).replace(microsecond=0)
+        thumbnail = self.thumbnails[0]
+        for hits in (3, 2):
+            take_accesses.return_value = Accesses(
+                {thumbnail.id: (accessed.timestamp(), hits)}, accessed.timestamp()
+            )
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(flush_thumbnail_accesses(), 1)
+
+        thumbnail.refresh_from_db()
+        self.assertEqual(thumbnail.accessed, accessed)
+        self.assertEqual(thumbnail.hits, 5)
+        self.assertEqual(ack_accesses.call_count, 2)
+
+    def test_failed_flush_keeps_accesses(self, take_accesses, ack_accesses):
+        thumbnail = self.thumbnails[0]
+        take_accesses.return_value = Accesses({thumbnail.id: (time.time(), 3)}, time.time())
+
+        with mock.patch.object(
+            Thumbnail.objects, "bulk_update", side_effect=DatabaseError()
+        ), self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(DatabaseError):
+                flush_thumbnail_accesses()
+        ack_accesses.assert_not_called()
+
+        # The next flush takes the same accesses again.
+        with self.captureOnCommitCallbacks(execute=True):
+            flush_thumbnail_accesses()
+
+        thumbnail.refresh_from_db()
+        self.assertEqual(thumbnail.hits, 3)
+        ack_accesses.assert_called_once()
+
+
+class RecordAccessTestCase(TestCase):
+    @mock.patch("apps.thumbnails.access.get_redis_connection")
+    def test_record_access(self, get_redis_connection):
+        record_access(1)
+
+        pipeline = get_redis_connection.return_value.pipeline.return_value
+        key, mapping = pipeline.zadd.call_args.args
+        self.assertEqual(key, ACCESS_KEY)
+        self.assertEqual(list(mapping), [1])
+        pipeline.hincrby.assert_called_once_with(HITS_KEY, 1, 1)
+        pipeline.execute.assert_called_once()
+
+    def test_record_access_without_redis(self):
+        record_access(1)
+
+    @mock.patch("apps.thumbnails.access.get_redis_connection")
+    def test_take_accesses(self, get_redis_connection):
+        connection = get_redis_connection.return_value
+        connection.pipeline.return_value.execute.return_value = (
+            [(b"1", 100.0)],
+            {b"1": b"3"},
+            b"90.5",
+        )
+
+        self.assertEqual(take_accesses(), Accesses({1: (100.0, 3)}, 90.5))
+        self.assertEqual(connection.eval.call_args.args[2:5], (ACCESS_KEY, HITS_KEY, SINCE_KEY))
+        connection.delete.assert_not_called()
@@ -0,0 +1,75 @@
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from ..exceptions import SourceNotFound, SourceNotImage
+from ..failures import get_failure, remember_failure
+from ..models import Thumbnail, get_thumbnail_key
+from ..notifications import FAILED, wait_for
+from ..tasks import process_thumbnail, process_thumbnails
+from .derivation_test import encode
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class FailuresTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.source_url = "https://picsum.photos/404"
+        self.url = f"/api/v1/thumbnails/100x100/{self.source_url}/"
+
+    @mock.patch("apps.thumbnails.tasks.fetch_source", side_effect=SourceNotFound("HTTP 404."))
+    def test_permanent_failure_not_retried(self, fetch_source):
+        process_thumbnails.apply(args=[self.source_url, [[100, 100]]])
+
+        fetch_source.assert_called_once()
+        self.assertEqual(
+            get_failure("https://PICSUM.photos/404"), {"status": 404, "reason": "HTTP 404."}
+        )
+        self.assertEqual(wait_for(get_thumbnail_key(self.source_url, 100, 100, "jpeg"), 0), FAILED)
+
+    @mock.patch("apps.thumbnails.derivation.fetch_source", return_value=b"<html>")
+    def test_undecodable_source(self, fetch_source):
+        thumbnail = Thumbnail.objects.create(url=self.source_url, max_width=100, max_height=100)
+
+        process_thumbnail.apply(args=[thumbnail.id])
+
+        fetch_source.assert_called_once()
+        self.assertEqual(get_failure(self.source_url)["status"], 422)
+
+    @mock.patch("apps.thumbnails.api.views.resize.process_thumbnail.apply_async")
+    def test_resize_known_failure(self, apply_async):
+        remember_failure(self.source_url, SourceNotImage("Unidentified image."))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_ACCEPT="image/*")
+
+        self.assertEqual(response.status_code, 422)
+        apply_async.assert_not_called()
+
+    @mock.patch("apps.thumbnails.api.views.batch.process_thumbnails")
+    def test_batch_known_failure(self, process_thumbnails):
+        remember_failure(self.source_url, SourceNotFound("HTTP 404."))
+
+        response = self.client.post(
+            "/api/v1/thumbnails/batch/",
+            {"items": [{"url": self.source_url, "sizes": [{"max_width": 10, "max_height": 10}]}]},
+            format="json",
+        )
+
+        self.assertEqual(response.data["data"]["items"][0]["sizes"][0]["status"], "failed")
+        process_thumbnails.s.assert_not_called()
+
+    @mock.patch("apps.thumbnails.tasks.encode_image", side_effect=OSError("encoder error"))
+    @mock.patch("apps.thumbnails.derivation.fetch_source")
+    def test_encode_error_retried(self, fetch_source, encode_image):
+        fetch_source.return_value = encode((100, 50))
+        thumbnail = Thumbnail.objects.create(url=self.source_url, max_width=100, max_height=100)
+
+        process_thumbnail.apply(args=[thumbnail.id])
+
+        self.assertEqual(fetch_source.call_count, 4)
+        self.assertIsNone(get_failure(self.source_url))
@@ -0,0 +1,52 @@
+import tempfile
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from ..models import Thumbnail
+from ..tasks import save_thumbnail_image
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class IndexTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.thumbnail = Thumbnail.objects.create(
+            url="https://picsum.photos/1000", max_height=100, max_width=100
+        )
+
+    def test_save_thumbnail_image_indexes(self):
+        self.assertIsNone(Thumbnail.objects.get_indexed(self.thumbnail.key))
+
+        image_io = BytesIO()
+        Image.new("RGB", (100, 50)).save(image_io, format="JPEG")
+        with self.captureOnCommitCallbacks(execute=True):
+            save_thumbnail_image(self.thumbnail, image_io.getvalue())
+
+        with self.assertNumQueries(0):
+            thumbnail = Thumbnail.objects.get_indexed(self.thumbnail.key)
+        self.assertEqual(thumbnail.id, self.thumbnail.id)
+        self.assertEqual(thumbnail.image.name, self.thumbnail.image.name)
+        self.assertEqual(thumbnail.checksum, self.thumbnail.checksum)
+        self.assertEqual(thumbnail.image.read(), image_io.getvalue())
+
+    def test_delete_unindexes(self):
+        self.thumbnail.image.save("index.jpeg", ContentFile(b"jpeg"))
+        self.thumbnail.index()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.thumbnail.delete()
+
+        self.assertIsNone(Thumbnail.objects.get_indexed(self.thumbnail.key))
+
+    def test_queryset_delete_unindexes(self):
+        self.thumbnail.image.save("index.jpeg", ContentFile(b"jpeg"))
+        self.thumbnail.index()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Thumbnail.objects.filter(url=self.thumbnail.url).delete()
+
+        self.assertIsNone(Thumbnail.objects.get_indexed(self.thumbnail.key))
@@ -0,0 +1,89 @@
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from kombu.exceptions import OperationalError
+from rest_framework.test import APIClient
+
+from ..inline import acquire_slot, release_slot
+from ..models import Thumbnail
+from ..tasks import save_thumbnail_image
+from .derivation_test import encode
+
+
+@override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(),
+    THUMBNAILS_DERIVE_MIN_RATIO=2.0,
+    THUMBNAILS_INLINE_SLOTS=1,
+    THUMBNAILS_INLINE_BROKER_BACKOFF=0,
+    THUMBNAILS_SOURCE_CACHE_MAX_BYTES=0,
+)
+class InlineTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.source_url = "https://picsum.photos/1000"
+        self.url = f"/api/v1/thumbnails/100x100/{self.source_url}/"
+
+    def test_slots(self):
+        self.assertTrue(acquire_slot())
+        self.assertFalse(acquire_slot())
+        release_slot()
+        self.assertTrue(acquire_slot())
+        release_slot()
+
+    @mock.patch("apps.thumbnails.api.views.resize.process_thumbnail.apply_async")
+    def test_small_derivative_inline(self, apply_async):
+        save_thumbnail_image(
+            Thumbnail.objects.create(url=self.source_url, max_width=400, max_height=400),
+            encode((400, 200)),
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(self.url, HTTP_ACCEPT="image/*")
+
+        self.assertEqual(response.status_code, 200)
+        apply_async.assert_not_called()
+        thumbnail = Thumbnail.objects.get(url=self.source_url, max_width=100)
+        self.assertEqual((thumbnail.width, thumbnail.height), (100, 50))
+
+    @override_settings(THUMBNAILS_INLINE_MAX_SOURCE_PIXELS=1000)
+    @mock.patch("apps.thumbnails.api.views.resize.wait_for")
+    @mock.patch("apps.thumbnails.api.views.resize.process_thumbnail.apply_async")
+    def test_large_derivative_queued(self, apply_async, wait_for):
+        save_thumbnail_image(
+            Thumbnail.objects.create(url=self.source_url, max_width=400, max_height=400),
+            encode((400, 200)),
+        )
+
+        self.client.get(self.url, HTTP_ACCEPT="image/*")
+
+        apply_async.assert_called_once()
+        wait_for.assert_called_once()
+
+    @mock.patch("apps.thumbnails.inline.make_thumbnail")
+    @mock.patch(
+        "apps.thumbnails.api.views.resize.process_thumbnail.apply_async",
+        side_effect=OperationalError(),
+    )
+    def test_broker_down_inline(self, apply_async, make_thumbnail):
+        make_thumbnail.side_effect = lambda thumbnail: save_thumbnail_image(
+            thumbnail, encode((100, 50))
+        )
+
+        response = self.client.get(self.url, HTTP_ACCEPT="image/*")
+
+        self.assertEqual(response.status_code, 200)
+        make_thumbnail.assert_called_once()
+
+    @override_settings(THUMBNAILS_INLINE_SLOTS=0)
+    @mock.patch(
+        "apps.thumbnails.api.views.resize.process_thumbnail.apply_async",
+        side_effect=OperationalError(),
+    )
+    def test_broker_down_no_slot(self, apply_async):
+        response = self.client.get(self.url, HTTP_ACCEPT="image/*")
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
@@ -0,0 +1,110 @@
+import tempfile
+from io import BytesIO
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from ..cache import SHARED_CACHE_KEY, get_byte_cache
+from ..models import Thumbnail, ThumbnailBlob, get_thumbnail_key
+
+
+class ThumbnailTestCase(TestCase):
+    def test_key(self):
+        self.assertEqual(
+            get_thumbnail_key("HTTPS://Picsum.photos:443/1000?b=2&a=1#top", 100, 100, "jpeg"),
+            get_thumbnail_key("https://picsum.photos/1000?a=1&b=2", 100, 100, "jpeg"),
+        )
+        self.assertNotEqual(
+            get_thumbnail_key("https://picsum.photos/1000", 100, 100, "jpeg"),
+            get_thumbnail_key("https://picsum.photos/1000", 100, 100, "webp"),
+        )
+
+    def test_get_or_insert(self):
+        thumbnail = Thumbnail.objects.get_or_insert("https://picsum.photos/1000", 100, 50)
+
+        self.assertEqual(
+            thumbnail.key, get_thumbnail_key("https://picsum.photos/1000", 100, 50, "jpeg")
+        )
+        self.assertEqual(
+            Thumbnail.objects.get_or_insert("https://PICSUM.photos/1000", 100, 50).id, thumbnail.id
+        )
+        self.assertEqual(Thumbnail.objects.count(), 1)
+
+    def test_get_or_insert_string_sizes(self):
+        thumbnail = Thumbnail.objects.get_or_insert("https://picsum.photos/1000", "0100", "050")
+        key = thumbnail.key
+        thumbnail.save()
+
+        self.assertEqual(thumbnail.key, key)
+        self.assertEqual(
+            Thumbnail.objects.get_or_insert("https://picsum.photos/1000", 100, 50).id, thumbnail.id
+        )
+
+    def test_save_sets_key(self):
+        thumbnail = Thumbnail.objects.create(
+            url="https://picsum.photos/1000", max_height=50, max_width=100, format="webp"
+        )
+
+        self.assertEqual(thumbnail.key, get_thumbnail_key(thumbnail.url, 100, 50, "webp"))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ThumbnailBlobTestCase(TestCase):
+    def setUp(self):
+        image_io = BytesIO()
+        Image.new("RGB", (100, 50)).save(image_io, format="JPEG")
+        self.content = image_io.getvalue()
+
+    def create_thumbnail(self, url: str) -> Thumbnail:
+        thumbnail = Thumbnail.objects.create(url=url, max_height=100, max_width=100)
+        with transaction.atomic():
+            thumbnail.set_blob(ThumbnailBlob.objects.store(self.content, "jpeg"))
+        return thumbnail
+
+    def test_store_deduplicates(self):
+        first = self.create_thumbnail("https://picsum.photos/1000")
+        second = self.create_thumbnail("https://picsum.photos/1000?utm_source=mail")
+
+        blob = ThumbnailBlob.objects.get()
+        self.assertEqual(blob.references, 2)
+        self.assertEqual((blob.width, blob.height), (100, 50))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(first.checksum, blob.checksum)
+
+    def test_release(self):
+        first = self.create_thumbnail("https://picsum.photos/1000")
+        second = self.create_thumbnail("https://picsum.photos/1000?utm_source=mail")
+        storage = first.image.storage
+
+        first.delete()
+        self.assertEqual(ThumbnailBlob.objects.get().references, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Thumbnail.objects.filter(id=second.id).delete()
+        self.assertFalse(ThumbnailBlob.objects.exists())
+        self.assertFalse(storage.exists(second.image.name))
+
+    def test_store_during_release(self):
+        thumbnail = self.create_thumbnail("https://picsum.photos/1000")
+        with self.captureOnCommitCallbacks() as callbacks:
+            thumbnail.delete()
+
+        blob = ThumbnailBlob.objects.store(self.content, "jpeg")
+        for callback in callbacks:
+            callback()
+
+        self.assertNotEqual(blob.image.name, thumbnail.image.name)
+        self.assertTrue(blob.image.storage.exists(blob.image.name))
+
+    def test_release_invalidates_byte_cache(self):
+        thumbnail = self.create_thumbnail("https://picsum.photos/1000")
+        byte_cache = get_byte_cache()
+        byte_cache.get(thumbnail.image.name, lambda: self.content)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            thumbnail.delete()
+
+        self.assertIsNone(byte_cache.local.get(thumbnail.image.name))
+        self.assertIsNone(cache.get(SHARED_CACHE_KEY.format(key=thumbnail.image.name)))
@@ -0,0 +1,65 @@
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from ..models import Thumbnail, get_thumbnail_key
+from ..notifications import DONE, FAILED, Subscription, get_statuses, notify, reset, wait_for
+from ..tasks import process_thumbnails, save_thumbnail_image
+from .tasks_test import encode
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class NotificationsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_notify(self):
+        notify(DONE, "a", "b")
+
+        self.assertEqual(wait_for("a", 0), DONE)
+        reset("a")
+        self.assertEqual(get_statuses(["a", "b"]), {"b": DONE})
+
+    def test_wait_timeout(self):
+        self.assertIsNone(wait_for("a", 0.2))
+
+    def test_wait_wakes_on_message(self):
+        pubsub = mock.Mock()
+        pubsub.get_message.return_value = {
+            "type": "message",
+            "channel": b"thumbnails:done:a",
+            "data": b"failed",
+        }
+        connection = mock.Mock()
+        connection.pubsub.return_value = pubsub
+
+        with mock.patch("apps.thumbnails.notifications.get_connection", return_value=connection):
+            with Subscription() as subscription:
+                subscription.add("a", "b")
+
+                self.assertEqual(subscription.wait(10), {"a": FAILED})
+                self.assertEqual(subscription.keys, {"b"})
+
+        pubsub.unsubscribe.assert_called_once_with("thumbnails:done:a")
+        pubsub.close.assert_called_once()
+
+    def test_saved_image_notifies(self):
+        thumbnail = Thumbnail.objects.create(
+            url="https://picsum.photos/1000", max_height=100, max_width=100
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            save_thumbnail_image(thumbnail, encode((100, 50), "JPEG"))
+
+        self.assertEqual(wait_for(thumbnail.key, 0), DONE)
+
+    @mock.patch("apps.thumbnails.tasks.fetch_source", side_effect=OSError())
+    def test_task_failure_notifies(self, fetch_source):
+        key = get_thumbnail_key("https://picsum.photos/1000", 100, 100, "jpeg")
+
+        process_thumbnails.apply(args=["https://picsum.photos/1000", [[100, 100]]])
+
+        self.assertEqual(fetch_source.call_count, 4)
+        self.assertEqual(wait_for(key, 0), FAILED)
@@ -0,0 +1,93 @@
+from unittest import mock
+
+from django.test import RequestFactory, TestCase, override_settings
+
+from ..models import Thumbnail
+from ..responses import RangeNotSatisfiable, parse_range, thumbnail_response
+
+
+class ParseRangeTestCase(TestCase):
+    def test_parse_range(self):
+        self.assertEqual(parse_range("bytes=0-9", 100), (0, 9))
+        self.assertEqual(parse_range("bytes=90-", 100), (90, 99))
+        self.assertEqual(parse_range("bytes=-10", 100), (90, 99))
+        self.assertEqual(parse_range("bytes=50-500", 100), (50, 99))
+        self.assertEqual(parse_range("bytes=-500", 100), (0, 99))
+
+    def test_parse_range_ignored(self):
+        self.assertIsNone(parse_range("bytes=0-9,20-29", 100))
+        self.assertIsNone(parse_range("items=0-9", 100))
+        self.assertIsNone(parse_range("bytes=9-0", 100))
+
+    def test_parse_range_not_satisfiable(self):
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range("bytes=100-", 100)
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range("bytes=-0", 100)
+
+
+@override_settings(THUMBNAILS_CACHE_MAX_AGE=60)
+class ThumbnailResponseTestCase(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.thumbnail = Thumbnail.objects.create(
+            url="https://picsum.photos/1000", max_height=100, max_width=100, checksum="abc"
+        )
+
+    def test_validators(self):
+        response = thumbnail_response(
+            self.factory.get("/"), self.thumbnail, lambda: b"jpeg", "image/jpeg"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"jpeg")
+        self.assertEqual(response["ETag"], '"abc"')
+        self.assertIn("Last-Modified", response)
+        self.assertIn("max-age=60", response["Cache-Control"])
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+
+    def test_if_none_match(self):
+        read = mock.Mock()
+
+        response = thumbnail_response(
+            self.factory.get("/", HTTP_IF_NONE_MATCH='"abc"'), self.thumbnail, read, "image/jpeg"
+        )
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], '"abc"')
+        read.assert_not_called()
+
+    def test_range(self):
+        response = thumbnail_response(
+            self.factory.get("/", HTTP_RANGE="bytes=1-2"),
+            self.thumbnail,
+            lambda: b"jpeg",
+            "image/jpeg",
+        )
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, b"pe")
+        self.assertEqual(response["Content-Range"], "bytes 1-2/4")
+
+    def test_range_if_range_mismatch(self):
+        response = thumbnail_response(
+            self.factory.get("/", HTTP_RANGE="bytes=1-2", HTTP_IF_RANGE='"other"'),
+            self.thumbnail,
+            lambda: b"jpeg",
+            "image/jpeg",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"jpeg")
+
+    def test_checksum_backfill(self):
+        Thumbnail.objects.filter(id=self.thumbnail.id).update(checksum="")
+        self.thumbnail.refresh_from_db()
+
+        response = thumbnail_response(
+            self.factory.get("/"), self.thumbnail, lambda: b"jpeg", "image/jpeg"
+        )
+
+        self.thumbnail.refresh_from_db()
+        self.assertEqual(len(self.thumbnail.checksum), 64)
+        self.assertEqual(response["ETag"], f'"{self.thumbnail.checksum}"')
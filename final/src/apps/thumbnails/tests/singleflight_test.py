@@ -0,0 +1,45 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from ..models import get_thumbnail_key
+from ..singleflight import release, start_or_join
+
+
+class SingleFlightTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.key = get_thumbnail_key("https://picsum.photos/1000", 100, 100, "jpeg")
+
+    def test_start_or_join(self):
+        dispatch = mock.Mock()
+
+        leader = start_or_join(self.key, 1, dispatch)
+        follower = start_or_join(self.key, 2, dispatch)
+
+        dispatch.assert_called_once_with(leader.task_id)
+        self.assertTrue(leader.leader)
+        self.assertFalse(follower.leader)
+        self.assertEqual(follower.task_id, leader.task_id)
+        self.assertEqual(follower.thumbnail_id, 1)
+
+    def test_release(self):
+        dispatch = mock.Mock()
+
+        first = start_or_join(self.key, 1, dispatch)
+        release(self.key, "other-task")
+        self.assertFalse(start_or_join(self.key, 1, dispatch).leader)
+
+        release(self.key, first.task_id)
+        second = start_or_join(self.key, 1, dispatch)
+
+        self.assertTrue(second.leader)
+        self.assertNotEqual(second.task_id, first.task_id)
+        self.assertEqual(dispatch.call_count, 2)
+
+    def test_dispatch_error_releases(self):
+        with self.assertRaises(ConnectionError):
+            start_or_join(self.key, 1, mock.Mock(side_effect=ConnectionError))
+
+        self.assertTrue(start_or_join(self.key, 1, mock.Mock()).leader)
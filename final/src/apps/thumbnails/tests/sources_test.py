@@ -0,0 +1,34 @@
+import os
+import tempfile
+import time
+import unittest
+
+from ..sources import SourceCache
+
+
+class SourceCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.source_cache = SourceCache(tempfile.mkdtemp(), max_bytes=10)
+
+    def test_get_set(self):
+        self.source_cache.set("https://picsum.photos/1000", b"image", etag='"v1"')
+
+        cached = self.source_cache.get("https://picsum.photos/1000")
+
+        self.assertEqual(cached.content, b"image")
+        self.assertEqual(cached.etag, '"v1"')
+        self.assertIsNone(cached.last_modified)
+        self.assertIsNone(self.source_cache.get("https://picsum.photos/2000"))
+
+    def test_evicts_least_recently_used(self):
+        self.source_cache.set("https://picsum.photos/1", b"1111")
+        self.source_cache.set("https://picsum.photos/2", b"2222")
+        data_path, _ = self.source_cache._paths("https://picsum.photos/1")
+        os.utime(data_path, (time.time() - 60, time.time() - 60))
+        self.source_cache.get("https://picsum.photos/2")
+
+        self.source_cache.set("https://picsum.photos/3", b"3333")
+
+        self.assertIsNone(self.source_cache.get("https://picsum.photos/1"))
+        self.assertIsNotNone(self.source_cache.get("https://picsum.photos/2"))
+        self.assertIsNotNone(self.source_cache.get("https://picsum.photos/3"))
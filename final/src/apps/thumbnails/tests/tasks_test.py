@@ -0,0 +1,112 @@
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from ..models import Thumbnail, ThumbnailBlob
+from ..tasks import (
+    process_thumbnail,
+    process_thumbnails,
+    render_thumbnail,
+    render_thumbnails,
+    shrink_on_load,
+)
+from ..workers import get_cpu_executor, run_cpu, shutdown_cpu_executor
+
+
+def encode(size: tuple[int, int], format: str) -> bytes:
+    image_io = BytesIO()
+    Image.new("RGB", size).save(image_io, format=format)
+    return image_io.getvalue()
+
+
+def open_encoded(size: tuple[int, int], format: str) -> Image.Image:
+    return Image.open(BytesIO(encode(size, format)))
+
+
+@override_settings(THUMBNAILS_REDUCING_GAP=2.0)
+class ShrinkOnLoadTestCase(TestCase):
+    def test_jpeg_draft(self):
+        image = shrink_on_load(open_encoded((2000, 1000), "JPEG"), (100, 100))
+
+        self.assertEqual(image.size, (250, 125))
+        self.assertEqual(render_thumbnail(image, (100, 100)).size, (100, 50))
+
+    def test_reduce(self):
+        image = shrink_on_load(open_encoded((2000, 1000), "PNG"), (100, 100))
+
+        self.assertEqual(image.size, (200, 100))
+        self.assertEqual(render_thumbnail(image, (100, 100)).size, (100, 50))
+
+    @override_settings(THUMBNAILS_REDUCING_GAP=0)
+    def test_disabled(self):
+        image = shrink_on_load(open_encoded((2000, 1000), "JPEG"), (100, 100))
+
+        self.assertEqual(image.size, (2000, 1000))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ProcessThumbnailsTestCase(TestCase):
+    @mock.patch("apps.thumbnails.tasks.fetch_source")
+    def test_process_thumbnails(self, fetch_source):
+        fetch_source.return_value = encode((1000, 500), "PNG")
+
+        thumbnail_ids = process_thumbnails("https://picsum.photos/1000", [[100, 100], [400, 50]])
+
+        fetch_source.assert_called_once()
+        thumbnails = Thumbnail.objects.in_bulk(thumbnail_ids)
+        sizes = {
+            (thumbnail.max_width, thumbnail.max_height): (
+                thumbnail.image.width,
+                thumbnail.image.height,
+            )
+            for thumbnail in thumbnails.values()
+        }
+        self.assertEqual(sizes, {(100, 100): (100, 50), (400, 50): (100, 50)})
+        self.assertTrue(all(thumbnail.checksum for thumbnail in thumbnails.values()))
+
+    @mock.patch("apps.thumbnails.tasks.render_thumbnails", wraps=render_thumbnails)
+    @mock.patch("apps.thumbnails.derivation.fetch_source")
+    def test_process_thumbnail_duplicate_source(self, fetch_source, render_thumbnails):
+        fetch_source.return_value = encode((1000, 500), "PNG")
+        first = Thumbnail.objects.create(
+            url="https://picsum.photos/1000", max_width=100, max_height=100
+        )
+        second = Thumbnail.objects.create(
+            url="https://cdn.example.com/1000.png", max_width=100, max_height=100
+        )
+
+        process_thumbnail(first.id)
+        process_thumbnail(second.id)
+
+        render_thumbnails.assert_called_once()
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(ThumbnailBlob.objects.get().references, 2)
+
+
+class RenderThumbnailsTestCase(TestCase):
+    def test_render_thumbnails(self):
+        rendering = render_thumbnails(encode((1000, 500), "PNG"), [(100, 100), (400, 50)], "jpeg")
+        contents = rendering.contents
+
+        sizes = {size: Image.open(BytesIO(content)).size for size, content in contents.items()}
+        self.assertEqual(sizes, {(100, 100): (100, 50), (400, 50): (100, 50)})
+        self.assertEqual(
+            [stage for stage, _, _ in rendering.timings],
+            ["decode", "resize", "encode", "resize", "encode"],
+        )
+
+    @override_settings(THUMBNAILS_WORKER_MODE="pipelined", THUMBNAILS_CPU_WORKERS=1)
+    def test_pipelined(self):
+        self.addCleanup(shutdown_cpu_executor)
+
+        contents = run_cpu(
+            render_thumbnails, encode((1000, 500), "PNG"), [(100, 100)], "jpeg"
+        ).contents
+
+        self.assertEqual(Image.open(BytesIO(contents[(100, 100)])).size, (100, 50))
+        self.assertIs(get_cpu_executor(), get_cpu_executor())
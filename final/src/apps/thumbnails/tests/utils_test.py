@@ -1,6 +1,28 @@
+import tempfile
 import unittest
+from io import BytesIO
+from unittest import mock
 
-from ..utils import get_pil_image_from_url
+import requests
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from ..exceptions import SourceError, SourceNotFound, SourceNotImage, SourceTooLarge
+from ..sources import SourceCache
+from ..utils import fetch_source, get_pil_image_from_url, normalize_url
+
+
+def encode(size: tuple[int, int]) -> bytes:
+    image_io = BytesIO()
+    Image.new("RGB", size).save(image_io, format="PNG")
+    return image_io.getvalue()
+
+
+def mock_response(status_code: int, content: bytes = b"", headers: dict | None = None):
+    response = mock.MagicMock(status_code=status_code, headers=headers or {})
+    response.__enter__.return_value = response
+    response.iter_content.return_value = [content[i : i + 10] for i in range(0, len(content), 10)]
+    return response
 
 
 class UtilsTestCase(unittest.TestCase):
@@ -10,3 +32,104 @@ class UtilsTestCase(unittest.TestCase):
         self.assertIsNotNone(image)
         self.assertEqual(image.width, 1000)
         self.assertEqual(image.height, 1000)
+
+    def test_normalize_url(self):
+        self.assertEqual(
+            normalize_url("HTTPS://Picsum.Photos:443/1000?b=2&a=1#top"),
+            "https://picsum.photos/1000?a=1&b=2",
+        )
+        self.assertEqual(normalize_url("http://picsum.photos:8080"), "http://picsum.photos:8080/")
+
+
+@override_settings(THUMBNAILS_SOURCE_CACHE_MAX_AGE=0)
+class FetchSourceTestCase(SimpleTestCase):
+    def setUp(self):
+        self.source_cache = SourceCache(tempfile.mkdtemp(), max_bytes=1024)
+        patcher = mock.patch(
+            "apps.thumbnails.utils.get_source_cache", return_value=self.source_cache
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.image = encode((10, 10))
+
+    @mock.patch("apps.thumbnails.utils.origin_get")
+    def test_revalidation(self, get):
+        get.return_value = mock_response(200, self.image, {"ETag": '"v1"'})
+        self.assertEqual(fetch_source("https://picsum.photos/1000"), self.image)
+
+        get.return_value = mock_response(304)
+        self.assertEqual(fetch_source("https://picsum.photos/1000"), self.image)
+        self.assertEqual(get.call_args.kwargs["headers"], {"If-None-Match": '"v1"'})
+
+    @override_settings(THUMBNAILS_SOURCE_CACHE_MAX_AGE=60)
+    @mock.patch("apps.thumbnails.utils.origin_get")
+    def test_fresh_hit(self, get):
+        get.return_value = mock_response(200, self.image)
+        fetch_source("https://picsum.photos/1000")
+
+        self.assertEqual(fetch_source("https://PICSUM.photos/1000"), self.image)
+        get.assert_called_once()
+
+    @mock.patch("apps.thumbnails.utils.origin_get")
+    def test_content_length_too_large(self, get):
+        get.return_value = mock_response(200, self.image, {"Content-Length": "1000000000"})
+
+        with self.assertRaises(SourceTooLarge):
+            fetch_source("https://picsum.photos/1000")
+        get.return_value.iter_content.assert_not_called()
+
+    @override_settings(THUMBNAILS_SOURCE_MAX_BYTES=20)
+    @mock.patch("apps.thumbnails.utils.origin_get")
+    def test_body_too_large(self, get):
+        get.return_value = mock_response(200, self.image)
+
+        with self.assertRaises(SourceTooLarge):
+            fetch_source("https://picsum.photos/1000")
+
+    @override_settings(THUMBNAILS_SOURCE_MAX_PIXELS=99)
+    @mock.patch("apps.thumbnails.utils.origin_get")
+    def test_too_many_pixels(self, get):
+        get.return_value = mock_response(200, self.image)
+
+        with self.assertRaises(SourceTooLarge):
+            fetch_source("https://picsum.photos/1000")
+
+    @mock.patch("apps.thumbnails.utils.origin_get")
+    def test_not_image_content_type(self, get):
+        get.return_value = mock_response(200, b"<html>", {"Content-Type": "text/html"})
+
+        with self.assertRaises(SourceNotImage):
+            fetch_source("https://picsum.photos/1000")
+
+    @mock.patch("apps.thumbnails.utils.origin_get")
+    def test_mislabeled_image(self, get):
+        for content_type in ("binary/octet-stream", "text/plain"):
+            get.return_value = mock_response(200, self.image, {"Content-Type": content_type})
+
+            self.assertEqual(fetch_source(f"https://picsum.photos/{content_type}"), self.image)
+
+    @override_settings(THUMBNAILS_SOURCE_SNIFF_BYTES=20)
+    @mock.patch("apps.thumbnails.utils.origin_get")
+    def test_not_image_body(self, get):
+        get.return_value = mock_response(200, b"<html>" * 10)
+
+        with self.assertRaises(SourceNotImage):
+            fetch_source("https://picsum.photos/1000")
+
+    @mock.patch("apps.thumbnails.utils.origin_get")
+    def test_client_errors_are_permanent(self, get):
+        get.return_value = mock_response(404)
+        with self.assertRaises(SourceNotFound):
+            fetch_source("https://picsum.photos/1000")
+
+        get.return_value = mock_response(403)
+        with self.assertRaises(SourceError):
+            fetch_source("https://picsum.photos/1000")
+
+    @mock.patch("apps.thumbnails.utils.origin_get")
+    def test_server_errors_are_retryable(self, get):
+        get.return_value = mock_response(503)
+        get.return_value.raise_for_status.side_effect = requests.HTTPError()
+
+        with self.assertRaises(requests.HTTPError):
+            fetch_source("https://picsum.photos/1000")
@@ -0,0 +1,87 @@
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+
+from ..models import Thumbnail, get_thumbnail_key
+from ..notifications import DONE, FAILED, notify
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class WarmThumbnailsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        thumbnail = Thumbnail.objects.create(
+            url="https://picsum.photos/1000", max_height=100, max_width=200
+        )
+        thumbnail.image.save("warm.jpeg", ContentFile(b"jpeg"))
+
+    def warm(self, lines: str, *args) -> str:
+        file = tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False)
+        with file:
+            file.write(lines)
+        stdout = StringIO()
+        call_command("warm_thumbnails", file.name, *args, stdout=stdout, stderr=StringIO())
+        return stdout.getvalue()
+
+    @mock.patch("apps.thumbnails.management.commands.warm_thumbnails.process_thumbnails")
+    def test_warm(self, process_thumbnails):
+        def apply_async(args, **kwargs):
+            url, sizes, format = args
+            notify(
+                FAILED if url.endswith("2000") else DONE,
+                *(
+                    get_thumbnail_key(url, max_width, max_height, format)
+                    for max_width, max_height in sizes
+                ),
+            )
+
+        process_thumbnails.apply_async.side_effect = apply_async
+
+        output = self.warm(
+            "# catalog\n"
+            "https://picsum.photos/1000 100x200 50x50\n"
+            "https://picsum.photos/2000\n"
+            "https://picsum.photos/3000 big\n",
+            "--size=10x10",
+            "--concurrency=1",
+        )
+
+        self.assertEqual(
+            process_thumbnails.apply_async.call_args_list,
+            [
+                mock.call(
+                    args=["https://picsum.photos/1000", [[50, 50]], "jpeg"],
+                    queue="bulk",
+                    priority=9,
+                ),
+                mock.call(
+                    args=["https://picsum.photos/2000", [[10, 10]], "jpeg"],
+                    queue="bulk",
+                    priority=9,
+                ),
+            ],
+        )
+        self.assertIn("1 existing, 2 enqueued, 1 invalid lines", output)
+        self.assertIn("1 done, 1 failed", output)
+
+    @mock.patch("apps.thumbnails.management.commands.warm_thumbnails.process_thumbnails")
+    def test_timeout(self, process_thumbnails):
+        stderr = StringIO()
+        stdout = StringIO()
+        file = tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False)
+        with file:
+            file.write("https://picsum.photos/2000 10x10\n")
+
+        call_command("warm_thumbnails", file.name, "--timeout=0", stdout=stdout, stderr=stderr)
+
+        self.assertIn("0 done, 1 failed (1 timed out)", stdout.getvalue())
+        self.assertIn("Timed out: https://picsum.photos/2000", stderr.getvalue())
+
+    def test_unsupported_format(self):
+        with self.assertRaises(CommandError):
+            self.warm("https://picsum.photos/1000 100x100\n", "--format=gif")
@@ -1,14 +1,178 @@
+from collections import Counter
 from io import BytesIO
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
 import requests
+from django.conf import settings
 from PIL import Image
 from PIL.Image import Image as PILImage
 
+from apps.metrics.prometheus import (
+    thumbnail_source_cache_hit_ratio,
+    thumbnail_source_cache_request_count,
+    thumbnail_source_cache_saved_bytes,
+)
+
+from .clients import origin_get
+from .exceptions import SourceError, SourceNotFound, SourceNotImage, SourceTooLarge
+from .sources import get_source_cache
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+# Content types that are surely not images (error pages, API errors, media). Other types are
+# not trusted either way: origins mislabel images (`binary/octet-stream`, `text/plain`...), the
+# body is sniffed instead.
+NON_IMAGE_CONTENT_TYPES = (
+    "text/html",
+    "application/xhtml+xml",
+    "application/json",
+    "application/problem+json",
+    "application/xml",
+    "text/xml",
+    "audio/",
+    "video/",
+)
+
+source_cache_results: Counter = Counter()
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize an URL: lowercase scheme and host, no default port, sorted query, no fragment.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = (parts.hostname or "").lower()
+    if ":" in netloc:
+        netloc = f"[{netloc}]"
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{parts.port}"
+    userinfo = parts.username or ""
+    if parts.password:
+        userinfo = f"{userinfo}:{parts.password}"
+    if userinfo:
+        netloc = f"{userinfo}@{netloc}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, parts.path or "/", query, ""))
+
+
+def record_source_cache_result(result: str) -> None:
+    source_cache_results[result] += 1
+    thumbnail_source_cache_request_count.labels(result=result).inc()
+    thumbnail_source_cache_hit_ratio.set(
+        1 - source_cache_results["miss"] / sum(source_cache_results.values())
+    )
+
+
+def fetch_source(url) -> bytes:
+    """
+    Get the bytes of a source image, revalidating the cached copy with the origin.
+    """
+    source_cache = get_source_cache()
+    key = normalize_url(url)
+    cached = source_cache.get(key) if source_cache else None
+
+    if cached is not None and cached.age < settings.THUMBNAILS_SOURCE_CACHE_MAX_AGE:
+        record_source_cache_result("hit")
+        thumbnail_source_cache_saved_bytes.inc(len(cached.content))
+        return cached.content
+
+    headers = {}
+    if cached is not None and cached.etag:
+        headers["If-None-Match"] = cached.etag
+    if cached is not None and cached.last_modified:
+        headers["If-Modified-Since"] = cached.last_modified
+
+    with origin_get(
+        url,
+        headers=headers,
+        stream=True,
+        timeout=(
+            settings.THUMBNAILS_SOURCE_CONNECT_TIMEOUT,
+            settings.THUMBNAILS_SOURCE_READ_TIMEOUT,
+        ),
+    ) as response:
+        if cached is not None and headers and response.status_code == 304:
+            record_source_cache_result("revalidated")
+            thumbnail_source_cache_saved_bytes.inc(len(cached.content))
+            source_cache.revalidated(key, cached)
+            return cached.content
+
+        check_status(response)
+        content = read_image_body(response)
+
+    record_source_cache_result("miss")
+    if source_cache is not None:
+        source_cache.set(
+            key,
+            content,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+    return content
+
+
+def check_status(response: requests.Response) -> None:
+    """
+    Raise for an error response of an origin: `SourceError` for the client errors that will not
+    go away by retrying, `requests.HTTPError` for the others.
+    """
+    if response.status_code in (404, 410):
+        raise SourceNotFound(f"HTTP {response.status_code}.")
+    if 400 <= response.status_code < 500 and response.status_code not in (408, 425, 429):
+        raise SourceError(f"HTTP {response.status_code}.")
+    response.raise_for_status()
+
+
+def check_image_header(content: bytes) -> bool:
+    """
+    Check the header of a partially downloaded image, `False` until it can be identified.
+    """
+    try:
+        # Opening is lazy: only the header is parsed, nothing is decoded.
+        image = Image.open(BytesIO(content))
+    except OSError:
+        # Not enough data yet, or not an image.
+        return False
+    except Image.DecompressionBombError as e:
+        raise SourceTooLarge(str(e))
+    if image.width * image.height > settings.THUMBNAILS_SOURCE_MAX_PIXELS:
+        raise SourceTooLarge(f"{image.width}x{image.height} pixels.")
+    return True
+
+
+def read_image_body(response: requests.Response) -> bytes:
+    """
+    Read the body of a source image response with bounded memory.
+
+    The declared length and type are checked before reading, the image header is checked while
+    downloading, so oversized or non-image bodies are aborted early.
+    """
+    max_bytes = settings.THUMBNAILS_SOURCE_MAX_BYTES
+    content_length = response.headers.get("Content-Length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise SourceTooLarge(f"Content-Length {content_length}.")
+    content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    if content_type.startswith(NON_IMAGE_CONTENT_TYPES):
+        raise SourceNotImage(f"Content-Type {content_type}.")
+
+    content = bytearray()
+    identified = False
+    for chunk in response.iter_content(chunk_size=64 * 1024):
+        content += chunk
+        if len(content) > max_bytes:
+            raise SourceTooLarge(f"More than {max_bytes} bytes.")
+        if not identified:
+            identified = check_image_header(bytes(content))
+            if not identified and len(content) > settings.THUMBNAILS_SOURCE_SNIFF_BYTES:
+                raise SourceNotImage("Unidentified image header.")
+
+    if not identified and not check_image_header(bytes(content)):
+        raise SourceNotImage("Unidentified image.")
+    return bytes(content)
+
 
 def get_pil_image_from_url(url) -> PILImage:
     """
     Get an image.
     """
-    response = requests.get(url)
-    response.raise_for_status()
-    return Image.open(BytesIO(response.content))
+    return Image.open(BytesIO(fetch_source(url)))
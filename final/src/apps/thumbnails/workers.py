@@ -0,0 +1,82 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable
+
+import django
+from celery.signals import worker_shutdown
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor: ProcessPoolExecutor | None = None
+_executor_pid: int | None = None
+
+
+def get_cpu_workers() -> int:
+    """
+    Get the size of the CPU stage pool, the number of cores unless configured.
+    """
+    return settings.THUMBNAILS_CPU_WORKERS or os.cpu_count() or 1
+
+
+def get_cpu_executor() -> ProcessPoolExecutor:
+    """
+    Get the CPU stage pool of this process.
+
+    Children are spawned rather than forked so that they never inherit the threads, sockets and
+    locks of the worker, and set Django up before their first job.
+    """
+    global _executor, _executor_pid
+
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(
+                max_workers=get_cpu_workers(),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=django.setup,
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def shutdown_cpu_executor(wait: bool = True) -> None:
+    """
+    Stop the CPU stage pool of this process, if any.
+    """
+    global _executor
+
+    with _lock:
+        if _executor is not None and _executor_pid == os.getpid():
+            _executor.shutdown(wait=wait, cancel_futures=True)
+        _executor = None
+
+
+def run_cpu(fn: Callable[..., Any], *args: Any) -> Any:
+    """
+    Run a CPU bound stage of a task.
+
+    In the "inline" worker mode the stage runs in the calling worker. In the "pipelined" mode it
+    runs in the CPU stage pool while the calling thread (or greenlet) waits, so a worker running
+    many I/O slots (`--pool threads` or `gevent`) keeps downloads and uploads going meanwhile.
+    The function and its arguments must be picklable.
+    """
+    if settings.THUMBNAILS_WORKER_MODE != "pipelined":
+        return fn(*args)
+
+    try:
+        return get_cpu_executor().submit(fn, *args).result()
+    except BrokenProcessPool:
+        # A child died (OOM killer...): start a new pool for the next jobs and let this one retry.
+        logger.warning("CPU stage pool is broken, restarting it")
+        shutdown_cpu_executor(wait=False)
+        raise
+
+
+@worker_shutdown.connect
+def on_worker_shutdown(**kwargs) -> None:
+    shutdown_cpu_executor()
@@ -2,6 +2,7 @@ import logging
 import os
 
 from celery import Celery, Task
+from kombu.exceptions import ChannelError
 
 from common.settings.conf.installed_apps import INSTALLED_APPS
 
@@ -40,6 +41,24 @@ BaseTask.bind(app=app)
 app.autodiscover_tasks(lambda: INSTALLED_APPS)
 
 
+def get_queue_depths(queues: list[str]) -> dict[str, int]:
+    """
+    Get the number of tasks waiting in queues, 0 for the queues never published to.
+
+    Raises when the broker is unreachable.
+    """
+    depths = {}
+    with app.connection_for_read() as connection:
+        connection.ensure_connection(max_retries=1)
+        channel = connection.default_channel
+        for queue in queues:
+            try:
+                depths[queue] = channel.queue_declare(queue, passive=True).message_count
+            except ChannelError:
+                depths[queue] = 0
+    return depths
+
+
 @app.task(bind=True)
 def debug_task(self):
     logger.info("Request: {0!r}".format(self.request))
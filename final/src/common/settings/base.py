@@ -29,4 +29,5 @@ include(
     "conf/redis.py",
     "conf/healthcheck.py",
     "conf/swagger.py",
+    "conf/thumbnails.py",
 )
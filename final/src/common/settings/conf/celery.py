@@ -11,8 +11,40 @@ CELERY_RESULT_SERIALIZER = "json"
 CELERY_TASK_DEFAULT_QUEUE = "default"
 
 CELERY_TASK_CREATE_MISSING_QUEUES = True
-CELERY_TASK_IGNORE_RESULT = False
+# Nothing reads task results: waiters are notified by thumbnail key (`notifications.py`).
+CELERY_TASK_IGNORE_RESULT = True
 
+# Each queue has workers of its own (see `k8s/celery-worker-deployment.yaml`):
+#   "interactive" -- thumbnails clients are waiting for;
+#   "bulk"        -- batches and warm-ups;
+#   "maintenance" -- periodic tasks.
+# Call sites may pick the queue and the priority of a task (`THUMBNAILS_*_QUEUE`).
 CELERY_TASK_ROUTES = {
+    "apps.thumbnails.tasks.process_thumbnail": {"queue": "interactive"},
+    "apps.thumbnails.tasks.process_thumbnails": {"queue": "bulk"},
+    "apps.thumbnails.tasks.flush_thumbnail_accesses": {"queue": "maintenance"},
+    "apps.thumbnails.tasks.evict_thumbnails": {"queue": "maintenance"},
     "*": {"queue": "default"},
 }
+
+# Redis emulates task priorities with a list per priority step: 0 is the highest priority and
+# the default, 9 the lowest. Workers consuming several queues empty them in the `-Q` order.
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    "priority_steps": list(range(10)),
+    "sep": ":",
+    "queue_order_strategy": "priority",
+}
+
+# Port of the Prometheus metrics of a worker (task wait times...), 0 disables it.
+WORKER_METRICS_PORT = env("WORKER_METRICS_PORT", cast=int, default=0)
+
+CELERY_BEAT_SCHEDULE = {
+    "flush-thumbnail-accesses": {
+        "task": "apps.thumbnails.tasks.flush_thumbnail_accesses",
+        "schedule": 60,
+    },
+    "evict-thumbnails": {
+        "task": "apps.thumbnails.tasks.evict_thumbnails",
+        "schedule": 60 * 60,
+    },
+}
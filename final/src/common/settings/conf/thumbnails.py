@@ -0,0 +1,187 @@
+from common.environ import env
+
+# Thumbnails
+
+# Answer cache misses with `202 Accepted` and a job URL instead of blocking the worker.
+# Clients may opt in per request with the `Prefer: respond-async` header.
+THUMBNAILS_RESIZE_ASYNC = env("THUMBNAILS_RESIZE_ASYNC", cast=bool, default=False)
+THUMBNAILS_JOB_TTL = env("THUMBNAILS_JOB_TTL", cast=int, default=60 * 60)
+THUMBNAILS_JOB_RETRY_AFTER = env("THUMBNAILS_JOB_RETRY_AFTER", cast=int, default=1)
+
+# Concurrent requests for the same thumbnail share a single task. The lease bounds how long
+# a key stays claimed when a worker dies without finishing it.
+THUMBNAILS_FLIGHT_LEASE = env("THUMBNAILS_FLIGHT_LEASE", cast=int, default=60)
+
+# Waiters of a thumbnail are notified over the pub/sub of the `THUMBNAILS_NOTIFY_CACHE` Redis
+# (a django-redis cache). The outcome is kept `THUMBNAILS_NOTIFY_TTL` seconds for late waiters,
+# which also check it every `THUMBNAILS_NOTIFY_POLL_INTERVAL` seconds in case a message is lost.
+THUMBNAILS_NOTIFY_CACHE = env("THUMBNAILS_NOTIFY_CACHE", cast=str, default="default")
+THUMBNAILS_NOTIFY_TTL = env("THUMBNAILS_NOTIFY_TTL", cast=int, default=60 * 60)
+THUMBNAILS_NOTIFY_POLL_INTERVAL = env("THUMBNAILS_NOTIFY_POLL_INTERVAL", cast=float, default=1.0)
+
+# Thumbnail bytes are cached in process (LRU bounded by total bytes) and in the shared cache
+# (TTL and per entry size cap) so that hits never read the storage.
+THUMBNAILS_LOCAL_CACHE_MAX_BYTES = env(
+    "THUMBNAILS_LOCAL_CACHE_MAX_BYTES", cast=int, default=64 * 1024 * 1024
+)
+THUMBNAILS_SHARED_CACHE = env("THUMBNAILS_SHARED_CACHE", cast=str, default="default")
+THUMBNAILS_SHARED_CACHE_TTL = env("THUMBNAILS_SHARED_CACHE_TTL", cast=int, default=24 * 60 * 60)
+THUMBNAILS_SHARED_CACHE_MAX_ENTRY_BYTES = env(
+    "THUMBNAILS_SHARED_CACHE_MAX_ENTRY_BYTES", cast=int, default=512 * 1024
+)
+
+# `Cache-Control: max-age` of thumbnail responses.
+THUMBNAILS_CACHE_MAX_AGE = env("THUMBNAILS_CACHE_MAX_AGE", cast=int, default=365 * 24 * 60 * 60)
+
+# How the bytes of existing thumbnails reach the client:
+#   "proxy"    -- through Django;
+#   "x-accel"  -- nginx serves `THUMBNAILS_X_ACCEL_LOCATION` + storage name (an internal location);
+#   "redirect" -- 302 to the storage URL, presigned for `common.storages.MediaStorage`
+#                 (see `AWS_QUERYSTRING_EXPIRE`).
+THUMBNAILS_DELIVERY_MODE = env("THUMBNAILS_DELIVERY_MODE", cast=str, default="proxy")
+THUMBNAILS_X_ACCEL_LOCATION = env(
+    "THUMBNAILS_X_ACCEL_LOCATION", cast=str, default="/protected-media/"
+)
+THUMBNAILS_REDIRECT_MAX_AGE = env("THUMBNAILS_REDIRECT_MAX_AGE", cast=int, default=5 * 60)
+
+# Source images are cached on the local disk of a worker (LRU bounded by total bytes, 0 disables)
+# and revalidated with the origin validators once older than `THUMBNAILS_SOURCE_CACHE_MAX_AGE`.
+THUMBNAILS_SOURCE_CACHE_DIR = env("THUMBNAILS_SOURCE_CACHE_DIR", cast=str, default="")
+THUMBNAILS_SOURCE_CACHE_MAX_BYTES = env(
+    "THUMBNAILS_SOURCE_CACHE_MAX_BYTES", cast=int, default=512 * 1024 * 1024
+)
+THUMBNAILS_SOURCE_CACHE_MAX_AGE = env("THUMBNAILS_SOURCE_CACHE_MAX_AGE", cast=int, default=60)
+
+# Celery queues of the thumbnails clients wait for and of bulk work (batches, warm-ups), see
+# `CELERY_TASK_ROUTES`. Batches have a lower priority than other bulk work (0 is the highest).
+THUMBNAILS_INTERACTIVE_QUEUE = env("THUMBNAILS_INTERACTIVE_QUEUE", cast=str, default="interactive")
+THUMBNAILS_BULK_QUEUE = env("THUMBNAILS_BULK_QUEUE", cast=str, default="bulk")
+THUMBNAILS_BATCH_PRIORITY = env("THUMBNAILS_BATCH_PRIORITY", cast=int, default=5)
+
+# Misses may be processed by the web process itself instead of a Celery worker, at most
+# `THUMBNAILS_INLINE_SLOTS` at once per process (0 disables it), when:
+#   - the source is small: a cached source of at most `THUMBNAILS_INLINE_MAX_SOURCE_BYTES`, or a
+#     thumbnail of at most `THUMBNAILS_INLINE_MAX_SOURCE_PIXELS` to resize from;
+#   - more than `THUMBNAILS_INLINE_QUEUE_DEPTH` tasks wait in the interactive queue (0 disables
+#     the check, the depth is sampled every second);
+#   - the broker failed less than `THUMBNAILS_INLINE_BROKER_BACKOFF` seconds ago.
+# Misses over the limit go to the queue, or get `503` while the broker is down.
+THUMBNAILS_INLINE_SLOTS = env("THUMBNAILS_INLINE_SLOTS", cast=int, default=2)
+THUMBNAILS_INLINE_MAX_SOURCE_BYTES = env(
+    "THUMBNAILS_INLINE_MAX_SOURCE_BYTES", cast=int, default=256 * 1024
+)
+THUMBNAILS_INLINE_MAX_SOURCE_PIXELS = env(
+    "THUMBNAILS_INLINE_MAX_SOURCE_PIXELS", cast=int, default=1_000_000
+)
+THUMBNAILS_INLINE_QUEUE_DEPTH = env("THUMBNAILS_INLINE_QUEUE_DEPTH", cast=int, default=0)
+THUMBNAILS_INLINE_BROKER_BACKOFF = env("THUMBNAILS_INLINE_BROKER_BACKOFF", cast=int, default=10)
+
+# Sources that can not be turned into thumbnails (origin 404, not an image, too large...) are
+# remembered in the `THUMBNAILS_FAILURE_CACHE` cache for `THUMBNAILS_FAILURE_TTL` seconds and
+# answered without processing them again.
+THUMBNAILS_FAILURE_CACHE = env("THUMBNAILS_FAILURE_CACHE", cast=str, default="default")
+THUMBNAILS_FAILURE_TTL = env("THUMBNAILS_FAILURE_TTL", cast=int, default=10 * 60)
+
+# Limits of a batch thumbnail request.
+THUMBNAILS_BATCH_MAX_ITEMS = env("THUMBNAILS_BATCH_MAX_ITEMS", cast=int, default=100)
+THUMBNAILS_BATCH_MAX_SIZES = env("THUMBNAILS_BATCH_MAX_SIZES", cast=int, default=10)
+
+# Sources are decoded at a reduced size keeping `THUMBNAILS_REDUCING_GAP` times the target
+# size (JPEG DCT scaling, integer reduce for other formats) and then resampled with
+# `THUMBNAILS_RESAMPLE` (a `PIL.Image.Resampling` name). A lower gap is faster, a higher one is
+# closer to a full decode, 0 always decodes the full image.
+THUMBNAILS_REDUCING_GAP = env("THUMBNAILS_REDUCING_GAP", cast=float, default=2.0)
+THUMBNAILS_RESAMPLE = env("THUMBNAILS_RESAMPLE", cast=str, default="BICUBIC")
+
+# Encoding profiles by format name: the Pillow format, the content type and Pillow save options
+# (quality, progressive, optimize, subsampling...). `strip_metadata` drops EXIF and ICC data.
+THUMBNAILS_ENCODING_PROFILES = {
+    "jpeg": {
+        "format": "JPEG",
+        "content_type": "image/jpeg",
+        "quality": 82,
+        "progressive": True,
+        "optimize": True,
+        "subsampling": "4:2:0",
+        "strip_metadata": True,
+    },
+    "webp": {
+        "format": "WEBP",
+        "content_type": "image/webp",
+        "quality": 80,
+        "method": 4,
+        "strip_metadata": True,
+    },
+    "avif": {
+        "format": "AVIF",
+        "content_type": "image/avif",
+        "quality": 60,
+        "speed": 6,
+        "subsampling": "4:2:0",
+        "strip_metadata": True,
+    },
+}
+# Formats offered to clients that list them in `Accept`, by preference. JPEG is the fallback.
+THUMBNAILS_FORMATS = env.list("THUMBNAILS_FORMATS", default=["avif", "webp"])
+
+# Limits of source image downloads. Bodies over `THUMBNAILS_SOURCE_MAX_BYTES`, images over
+# `THUMBNAILS_SOURCE_MAX_PIXELS` and bodies without an image header in the first
+# `THUMBNAILS_SOURCE_SNIFF_BYTES` are rejected while downloading.
+THUMBNAILS_SOURCE_CONNECT_TIMEOUT = env(
+    "THUMBNAILS_SOURCE_CONNECT_TIMEOUT", cast=float, default=3.05
+)
+THUMBNAILS_SOURCE_READ_TIMEOUT = env("THUMBNAILS_SOURCE_READ_TIMEOUT", cast=float, default=10)
+THUMBNAILS_SOURCE_MAX_BYTES = env("THUMBNAILS_SOURCE_MAX_BYTES", cast=int, default=32 * 1024 * 1024)
+THUMBNAILS_SOURCE_MAX_PIXELS = env("THUMBNAILS_SOURCE_MAX_PIXELS", cast=int, default=50_000_000)
+THUMBNAILS_SOURCE_SNIFF_BYTES = env("THUMBNAILS_SOURCE_SNIFF_BYTES", cast=int, default=1024 * 1024)
+
+# Source images are fetched with keep-alive connections pooled per origin host. The connections
+# a pool can keep per host must cover the threads of the worker (its `--concurrency`, see
+# `THUMBNAILS_WORKER_MODE`): the connections over it are closed after each request.
+THUMBNAILS_HTTP_POOL_HOSTS = env("THUMBNAILS_HTTP_POOL_HOSTS", cast=int, default=32)
+THUMBNAILS_HTTP_POOL_MAXSIZE = env("THUMBNAILS_HTTP_POOL_MAXSIZE", cast=int, default=32)
+THUMBNAILS_HTTP_RETRIES = env("THUMBNAILS_HTTP_RETRIES", cast=int, default=2)
+
+# How a Celery worker runs thumbnail tasks:
+#   "inline"    -- each task downloads, resizes, encodes and uploads in turn (prefork workers);
+#   "pipelined" -- tasks do the downloads and uploads and hand decoding, resizing and encoding to
+#                  a pool of `THUMBNAILS_CPU_WORKERS` processes (the number of cores when 0). Run
+#                  the worker with many I/O slots: `--pool threads --concurrency 32`, and
+#                  `THUMBNAILS_HTTP_POOL_MAXSIZE` at least the concurrency.
+THUMBNAILS_WORKER_MODE = env("THUMBNAILS_WORKER_MODE", cast=str, default="inline")
+THUMBNAILS_CPU_WORKERS = env("THUMBNAILS_CPU_WORKERS", cast=int, default=0)
+
+# Processed thumbnails are indexed by key (storage name, size and validators) in this cache so
+# that hits are served without querying the database.
+THUMBNAILS_INDEX_CACHE = env("THUMBNAILS_INDEX_CACHE", cast=str, default="default")
+THUMBNAILS_INDEX_TTL = env("THUMBNAILS_INDEX_TTL", cast=int, default=7 * 24 * 60 * 60)
+
+# New thumbnails are resized from the smallest processed thumbnail of the same URL that is at
+# least `THUMBNAILS_DERIVE_MIN_RATIO` times larger instead of the origin image. Higher keeps more
+# quality, 1 allows any larger thumbnail, 0 always uses the origin image.
+THUMBNAILS_DERIVE_MIN_RATIO = env("THUMBNAILS_DERIVE_MIN_RATIO", cast=float, default=2.0)
+
+# `manage.py warm_thumbnails` enqueues on the bulk queue with the lowest priority, with at most
+# `THUMBNAILS_WARM_CONCURRENCY` images in flight.
+THUMBNAILS_WARM_PRIORITY = env("THUMBNAILS_WARM_PRIORITY", cast=int, default=9)
+THUMBNAILS_WARM_CONCURRENCY = env("THUMBNAILS_WARM_CONCURRENCY", cast=int, default=16)
+# Images not processed within `THUMBNAILS_WARM_TIMEOUT` seconds (a lost task...) count as failed,
+# by default the lease of each attempt of a task (1 + 3 retries).
+THUMBNAILS_WARM_TIMEOUT = env(
+    "THUMBNAILS_WARM_TIMEOUT", cast=int, default=THUMBNAILS_FLIGHT_LEASE * 4
+)
+
+# Thumbnail accesses (last access time and hits) are recorded in the `THUMBNAILS_ACCESS_CACHE`
+# Redis (a django-redis cache) and flushed to the database in bulk, in batches of
+# `THUMBNAILS_ACCESS_FLUSH_BATCH_SIZE` rows. `evict_thumbnails` deletes the thumbnails not
+# accessed for `THUMBNAILS_MAX_IDLE` seconds, then the least recently accessed ones until the
+# stored images fit in `THUMBNAILS_STORAGE_MAX_BYTES` (0 disables either limit), with
+# `THUMBNAILS_STORAGE_DELETE_WORKERS` storage deletes in parallel.
+THUMBNAILS_ACCESS_CACHE = env("THUMBNAILS_ACCESS_CACHE", cast=str, default="default")
+THUMBNAILS_ACCESS_FLUSH_BATCH_SIZE = env(
+    "THUMBNAILS_ACCESS_FLUSH_BATCH_SIZE", cast=int, default=1000
+)
+THUMBNAILS_MAX_IDLE = env("THUMBNAILS_MAX_IDLE", cast=int, default=90 * 24 * 60 * 60)
+THUMBNAILS_STORAGE_MAX_BYTES = env("THUMBNAILS_STORAGE_MAX_BYTES", cast=int, default=0)
+THUMBNAILS_EVICTION_BATCH_SIZE = env("THUMBNAILS_EVICTION_BATCH_SIZE", cast=int, default=1000)
+THUMBNAILS_STORAGE_DELETE_WORKERS = env("THUMBNAILS_STORAGE_DELETE_WORKERS", cast=int, default=16)